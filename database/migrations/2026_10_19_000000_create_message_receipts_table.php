@@ -0,0 +1,34 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    /**
+     * Run the migrations.
+     */
+    public function up(): void
+    {
+        Schema::create('message_receipts', function (Blueprint $table) {
+            $table->id();
+            $table->string('campaign_id', 64); // ID pengiriman massal dari layanan WhatsApp (FastAPI)
+            $table->string('phone', 20); // Nomor tujuan (format 62xxx)
+            $table->datetime('sent_at')->nullable();
+            $table->datetime('delivered_at')->nullable();
+            $table->datetime('read_at')->nullable();
+            $table->timestamps();
+
+            $table->unique(['campaign_id', 'phone']);
+        });
+    }
+
+    /**
+     * Reverse the migrations.
+     */
+    public function down(): void
+    {
+        Schema::dropIfExists('message_receipts');
+    }
+};
@@ -0,0 +1,37 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    /**
+     * Run the migrations.
+     */
+    public function up(): void
+    {
+        // MAX(updated_at) dicek berkala oleh query cache layanan WhatsApp (FastAPI)
+        Schema::table('customers', function (Blueprint $table) {
+            $table->index('updated_at');
+        });
+
+        Schema::table('network_notices', function (Blueprint $table) {
+            $table->index('updated_at');
+        });
+    }
+
+    /**
+     * Reverse the migrations.
+     */
+    public function down(): void
+    {
+        Schema::table('customers', function (Blueprint $table) {
+            $table->dropIndex(['updated_at']);
+        });
+
+        Schema::table('network_notices', function (Blueprint $table) {
+            $table->dropIndex(['updated_at']);
+        });
+    }
+};
@@ -1,15 +1,87 @@
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, exc
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from app.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=3600
-)
+
+class PoolStats:
+    """
+    Statistik checkout connection pool
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.waits = 0  # Checkout yang harus menunggu karena pool & overflow penuh
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.overflow_checkouts = 0  # Checkout yang membuka koneksi overflow
+        self.timeouts = 0
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool yang mencatat checkout, waktu tunggu, overflow dan timeout
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        must_wait = self.checkedin() == 0 and self._overflow >= self._max_overflow
+        overflow_before = self._overflow
+        started = time.perf_counter()
+
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            if must_wait:
+                elapsed = time.perf_counter() - started
+                self.stats.waits += 1
+                self.stats.wait_time_total += elapsed
+                self.stats.wait_time_max = max(self.stats.wait_time_max, elapsed)
+
+        self.stats.checkouts += 1
+        if self._overflow > overflow_before and self._overflow > 0:
+            self.stats.overflow_checkouts += 1
+        return conn
+
+    def _do_return_conn(self, record):
+        self.stats.checkins += 1
+        super()._do_return_conn(record)
+
+
+def _create_engine(url: str):
+    return create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+        pool_recycle=settings.DB_POOL_RECYCLE
+    )
+
+
+# Primary: dipakai untuk semua penulisan (sama dengan aplikasi Laravel)
+engine = _create_engine(settings.DATABASE_URL)
+
+# Read replica (opsional): query baca notifikasi & daftar data
+read_engine = _create_engine(settings.DB_READ_URL) if settings.DB_READ_URL else engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 Base = declarative_base()
 
@@ -19,3 +91,41 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """
+    Session untuk query read-only (diarahkan ke replica jika DB_READ_URL diisi)
+    """
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _pool_status(target_engine) -> dict:
+    pool = target_engine.pool
+    stats = pool.stats
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": pool._max_overflow,
+        "timeout_seconds": pool.timeout(),
+        "checkouts": stats.checkouts,
+        "checkins": stats.checkins,
+        "waits": stats.waits,
+        "wait_ms_avg": round(stats.wait_time_total / stats.waits * 1000, 2) if stats.waits else 0.0,
+        "wait_ms_max": round(stats.wait_time_max * 1000, 2),
+        "overflow_checkouts": stats.overflow_checkouts,
+        "timeouts": stats.timeouts
+    }
+
+def get_pool_stats() -> dict:
+    """
+    Statistik connection pool primary dan replica
+    """
+    return {
+        "primary": _pool_status(engine),
+        "replica": _pool_status(read_engine) if read_engine is not engine else None
+    }
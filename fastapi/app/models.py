@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Text, UniqueConstraint
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -43,3 +43,31 @@ class NetworkNotice(Base):
     created_by = Column(Integer, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class MessageReceipt(Base):
+    __tablename__ = "message_receipts"
+    __table_args__ = (UniqueConstraint("campaign_id", "phone"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(String(64), nullable=False)
+    phone = Column(String(20), nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+    delivered_at = Column(DateTime, nullable=True)
+    read_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class Complaint(Base):
+    __tablename__ = "complaints"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, nullable=False)
+    subject = Column(String(255), nullable=False)
+    message = Column(Text, nullable=False)
+    category = Column(String(20), default="lainnya")  # gangguan, pembayaran, layanan, lainnya
+    status = Column(String(20), default="pending")  # pending, in_progress, resolved, closed
+    priority = Column(String(10), default="medium")  # low, medium, high
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
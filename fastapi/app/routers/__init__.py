@@ -1,4 +1,9 @@
 # Routers module
 from app.routers.notifications import router as notifications_router
+from app.routers.scheduler import router as scheduler_router
+from app.routers.receipts import router as receipts_router
+from app.routers.cache import router as cache_router
+from app.routers.outages import router as outages_router
+from app.routers.progress import router as progress_router
 
-__all__ = ['notifications_router']
+__all__ = ['notifications_router', 'scheduler_router', 'receipts_router', 'cache_router', 'outages_router', 'progress_router']
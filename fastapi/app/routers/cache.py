@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+
+from app.services.cache import query_cache
+
+router = APIRouter(tags=["cache"])
+
+
+@router.get("/api/cache/stats")
+async def get_cache_stats():
+    """
+    Statistik query cache (hit/miss, invalidasi, versi tabel)
+    """
+    return query_cache.get_stats()
+
+
+@router.post("/api/cache/clear")
+async def clear_cache():
+    """
+    Kosongkan query cache secara manual
+    """
+    query_cache.clear()
+    return {"success": True, "message": "Cache dikosongkan"}
@@ -1,22 +1,32 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
 from typing import List, Optional
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_read_db
 from app.models import Customer, NetworkNotice
 from app.schemas import (
     SendNotificationRequest,
     SendCustomMessageRequest,
     SendToPhoneRequest,
     NotificationResponse,
+    DryRunSummary,
     NetworkNoticeResponse,
     CustomerResponse,
     WhatsAppStatusResponse,
     SendResult
 )
-from app.services.whatsapp import whatsapp_service
+from app.services.whatsapp import whatsapp_service, SKIP_ERRORS
+from app.services.notices import (
+    format_notice_message,
+    get_latest_active_notice,
+    get_notice as get_notice_cached,
+    query_notice_audience
+)
+from app.services.cache import query_cache
+from app.services.admission import admission_controller
+from app.services.campaigns import run_campaign
+from app.services.scheduler import notice_scheduler
 
 router = APIRouter(tags=["notifications"])
 
@@ -85,26 +95,29 @@ async def logout_whatsapp():
 @router.get("/api/notices", response_model=List[NetworkNoticeResponse])
 async def get_notices(
     active_only: bool = Query(True, description="Hanya tampilkan notice yang aktif"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Ambil daftar pemberitahuan gangguan
     """
-    query = db.query(NetworkNotice)
-    
-    if active_only:
-        query = query.filter(NetworkNotice.is_active == True)
+    def load():
+        query = db.query(NetworkNotice)
+        
+        if active_only:
+            query = query.filter(NetworkNotice.is_active == True)
+        
+        notices = query.order_by(NetworkNotice.created_at.desc()).all()
+        return [NetworkNoticeResponse.model_validate(n) for n in notices]
     
-    notices = query.order_by(NetworkNotice.created_at.desc()).all()
-    return notices
+    return query_cache.get_or_load(("notices", active_only), ("network_notices",), load)
 
 
 @router.get("/api/notices/{notice_id}", response_model=NetworkNoticeResponse)
-async def get_notice(notice_id: int, db: Session = Depends(get_db)):
+async def get_notice(notice_id: int, db: Session = Depends(get_read_db)):
     """
     Ambil detail pemberitahuan gangguan berdasarkan ID
     """
-    notice = db.query(NetworkNotice).filter(NetworkNotice.id == notice_id).first()
+    notice = get_notice_cached(db, notice_id)
     if not notice:
         raise HTTPException(status_code=404, detail="Pemberitahuan tidak ditemukan")
     return notice
@@ -114,27 +127,29 @@ async def get_notice(notice_id: int, db: Session = Depends(get_db)):
 async def get_customers(
     active_only: bool = Query(True, description="Hanya tampilkan pelanggan aktif"),
     odp: Optional[str] = Query(None, description="Filter berdasarkan ODP"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Ambil daftar pelanggan
     """
-    query = db.query(Customer)
-    
-    if active_only:
-        query = query.filter(Customer.is_active == True)
-    
-    if odp:
-        query = query.filter(Customer.odp == odp)
+    def load():
+        query = db.query(Customer)
+        
+        if active_only:
+            query = query.filter(Customer.is_active == True)
+        
+        if odp:
+            query = query.filter(Customer.odp == odp)
+        
+        return [CustomerResponse.model_validate(c) for c in query.all()]
     
-    customers = query.all()
-    return customers
+    return query_cache.get_or_load(("customers", active_only, odp), ("customers",), load)
 
 
 @router.post("/api/send/notification", response_model=NotificationResponse)
 async def send_notification(
     request: SendNotificationRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Kirim notifikasi gangguan ke pelanggan via WhatsApp
@@ -142,38 +157,33 @@ async def send_notification(
     - Jika notice_id tidak diisi, akan mengambil notice aktif terbaru
     - Jika customer_ids tidak diisi, akan kirim ke semua pelanggan aktif
     - Pelanggan dengan nomor telepon '0' atau invalid akan dilewati
+    - dry_run=true hanya menghitung audience dan estimasi durasi
+    - Notice yang dikirim ke semua pelanggan tidak dikirim ulang oleh
+      scheduler saat start_time
     """
     # Ambil notice
     if request.notice_id:
-        notice = db.query(NetworkNotice).filter(NetworkNotice.id == request.notice_id).first()
+        notice = get_notice_cached(db, request.notice_id)
         if not notice:
             raise HTTPException(status_code=404, detail="Pemberitahuan tidak ditemukan")
     else:
         # Ambil notice aktif terbaru
-        notice = db.query(NetworkNotice).filter(
-            NetworkNotice.is_active == True
-        ).order_by(NetworkNotice.created_at.desc()).first()
+        notice = get_latest_active_notice(db)
         
         if not notice:
             raise HTTPException(status_code=404, detail="Tidak ada pemberitahuan aktif")
     
     # Siapkan pesan
-    message = request.custom_message or _format_notice_message(notice)
-    
-    # Ambil pelanggan
-    query = db.query(Customer).filter(Customer.is_active == True)
-    
-    if request.customer_ids:
-        query = query.filter(Customer.id.in_(request.customer_ids))
+    message = request.custom_message or format_notice_message(notice)
+    media_path = _resolve_media(request.media)
     
-    # Jika notice memiliki affected_odp, filter pelanggan berdasarkan ODP
-    if notice.affected_odp and not request.customer_ids:
-        odp_list = [odp.strip() for odp in notice.affected_odp.split(',')]
-        query = query.filter(Customer.odp.in_(odp_list))
+    # Ambil pelanggan (filter ODP dari affected_odp jika customer_ids kosong)
+    recipients = query_notice_audience(db, notice, request.customer_ids)
     
-    customers = query.all()
+    if request.dry_run:
+        return _dry_run_response(recipients)
     
-    if not customers:
+    if not recipients:
         return NotificationResponse(
             success=True,
             message="Tidak ada pelanggan yang perlu dikirim notifikasi",
@@ -184,27 +194,27 @@ async def send_notification(
             results=[]
         )
     
-    # Siapkan recipients
-    recipients = [
-        {"phone": c.phone, "name": c.name, "id": c.id}
-        for c in customers
-    ]
+    # Scheduler tidak perlu mengirim notice ini lagi saat start_time
+    if not request.customer_ids:
+        notice_scheduler.mark_sent(notice.id)
     
     # Kirim pesan
-    results = await whatsapp_service.send_bulk(recipients, message)
+    campaign = await run_campaign(recipients, message, campaign_id=request.campaign_id, media_path=media_path)
+    results = campaign["results"]
     
     # Hitung statistik
     sent_count = sum(1 for r in results if r.get("success"))
-    failed_count = sum(1 for r in results if not r.get("success") and r.get("error") != "Nomor tidak valid atau 0")
-    skipped_count = sum(1 for r in results if r.get("error") == "Nomor tidak valid atau 0")
+    failed_count = sum(1 for r in results if not r.get("success") and r.get("error") not in SKIP_ERRORS)
+    skipped_count = sum(1 for r in results if r.get("error") in SKIP_ERRORS)
     
     return NotificationResponse(
         success=True,
-        message=f"Notifikasi berhasil diproses untuk {len(customers)} pelanggan",
-        total_customers=len(customers),
+        message=f"Notifikasi berhasil diproses untuk {len(recipients)} pelanggan",
+        total_customers=len(recipients),
         sent_count=sent_count,
         failed_count=failed_count,
         skipped_count=skipped_count,
+        campaign_id=campaign["campaign_id"],
         results=[SendResult(**r) for r in results]
     )
 
@@ -212,23 +222,24 @@ async def send_notification(
 @router.post("/api/send/custom", response_model=NotificationResponse)
 async def send_custom_message(
     request: SendCustomMessageRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Kirim pesan kustom ke pelanggan
     
     - Jika customer_ids tidak diisi, akan kirim ke semua pelanggan aktif
     - Gunakan {name} atau {nama} sebagai placeholder untuk nama pelanggan
+    - dry_run=true hanya menghitung audience dan estimasi durasi
     """
-    # Ambil pelanggan
-    query = db.query(Customer).filter(Customer.is_active == True)
+    media_path = _resolve_media(request.media)
     
-    if request.customer_ids:
-        query = query.filter(Customer.id.in_(request.customer_ids))
+    # Ambil pelanggan
+    recipients = query_notice_audience(db, customer_ids=request.customer_ids)
     
-    customers = query.all()
+    if request.dry_run:
+        return _dry_run_response(recipients)
     
-    if not customers:
+    if not recipients:
         return NotificationResponse(
             success=True,
             message="Tidak ada pelanggan yang perlu dikirim pesan",
@@ -239,37 +250,42 @@ async def send_custom_message(
             results=[]
         )
     
-    # Siapkan recipients
-    recipients = [
-        {"phone": c.phone, "name": c.name, "id": c.id}
-        for c in customers
-    ]
-    
     # Kirim pesan
-    results = await whatsapp_service.send_bulk(recipients, request.message)
+    campaign = await run_campaign(recipients, request.message, campaign_id=request.campaign_id, media_path=media_path)
+    results = campaign["results"]
     
     # Hitung statistik
     sent_count = sum(1 for r in results if r.get("success"))
-    failed_count = sum(1 for r in results if not r.get("success") and r.get("error") != "Nomor tidak valid atau 0")
-    skipped_count = sum(1 for r in results if r.get("error") == "Nomor tidak valid atau 0")
+    failed_count = sum(1 for r in results if not r.get("success") and r.get("error") not in SKIP_ERRORS)
+    skipped_count = sum(1 for r in results if r.get("error") in SKIP_ERRORS)
     
     return NotificationResponse(
         success=True,
-        message=f"Pesan berhasil diproses untuk {len(customers)} pelanggan",
-        total_customers=len(customers),
+        message=f"Pesan berhasil diproses untuk {len(recipients)} pelanggan",
+        total_customers=len(recipients),
         sent_count=sent_count,
         failed_count=failed_count,
         skipped_count=skipped_count,
+        campaign_id=campaign["campaign_id"],
         results=[SendResult(**r) for r in results]
     )
 
 
+@router.get("/api/send/queue")
+async def get_send_queue():
+    """
+    Status antrean pengiriman massal (campaign aktif, antrean tunggu, penolakan)
+    """
+    return admission_controller.get_stats()
+
+
 @router.post("/api/send/phone")
 async def send_to_phone(request: SendToPhoneRequest):
     """
     Kirim pesan ke nomor telepon tertentu (untuk testing)
     """
-    result = await whatsapp_service.send_message(request.phone, request.message)
+    media_path = _resolve_media(request.media)
+    result = await whatsapp_service.send_message(request.phone, request.message, media_path)
     return result
 
 
@@ -277,17 +293,19 @@ async def send_to_phone(request: SendToPhoneRequest):
 async def send_by_odp(
     odp: str,
     request: SendNotificationRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Kirim notifikasi ke pelanggan berdasarkan ODP tertentu
+    
+    - dry_run=true hanya menghitung audience dan estimasi durasi
     """
     # Ambil notice
     if request.notice_id:
-        notice = db.query(NetworkNotice).filter(NetworkNotice.id == request.notice_id).first()
+        notice = get_notice_cached(db, request.notice_id)
         if not notice:
             raise HTTPException(status_code=404, detail="Pemberitahuan tidak ditemukan")
-        message = request.custom_message or _format_notice_message(notice)
+        message = request.custom_message or format_notice_message(notice)
     else:
         if not request.custom_message:
             raise HTTPException(
@@ -296,12 +314,15 @@ async def send_by_odp(
             )
         message = request.custom_message
     
+    media_path = _resolve_media(request.media)
+    
     # Ambil pelanggan berdasarkan ODP
-    customers = db.query(Customer).filter(
-        and_(Customer.is_active == True, Customer.odp == odp)
-    ).all()
+    recipients = query_notice_audience(db, odp=odp)
+    
+    if request.dry_run:
+        return _dry_run_response(recipients)
     
-    if not customers:
+    if not recipients:
         return NotificationResponse(
             success=True,
             message=f"Tidak ada pelanggan aktif di ODP {odp}",
@@ -312,76 +333,60 @@ async def send_by_odp(
             results=[]
         )
     
-    # Siapkan recipients
-    recipients = [
-        {"phone": c.phone, "name": c.name, "id": c.id}
-        for c in customers
-    ]
-    
     # Kirim pesan
-    results = await whatsapp_service.send_bulk(recipients, message)
+    campaign = await run_campaign(recipients, message, campaign_id=request.campaign_id, media_path=media_path)
+    results = campaign["results"]
     
     # Hitung statistik
     sent_count = sum(1 for r in results if r.get("success"))
-    failed_count = sum(1 for r in results if not r.get("success") and r.get("error") != "Nomor tidak valid atau 0")
-    skipped_count = sum(1 for r in results if r.get("error") == "Nomor tidak valid atau 0")
+    failed_count = sum(1 for r in results if not r.get("success") and r.get("error") not in SKIP_ERRORS)
+    skipped_count = sum(1 for r in results if r.get("error") in SKIP_ERRORS)
     
     return NotificationResponse(
         success=True,
-        message=f"Notifikasi berhasil diproses untuk {len(customers)} pelanggan di ODP {odp}",
-        total_customers=len(customers),
+        message=f"Notifikasi berhasil diproses untuk {len(recipients)} pelanggan di ODP {odp}",
+        total_customers=len(recipients),
         sent_count=sent_count,
         failed_count=failed_count,
         skipped_count=skipped_count,
+        campaign_id=campaign["campaign_id"],
         results=[SendResult(**r) for r in results]
     )
 
 
-def _format_notice_message(notice: NetworkNotice) -> str:
+def _dry_run_response(recipients: list) -> NotificationResponse:
     """
-    Format pesan dari NetworkNotice
+    Ringkasan audience tanpa menghubungi gateway
     """
-    severity_emoji = {
-        "low": "ℹ️",
-        "medium": "⚠️",
-        "high": "🔴",
-        "critical": "🚨"
-    }
-    
-    type_text = {
-        "gangguan": "GANGGUAN JARINGAN",
-        "maintenance": "MAINTENANCE TERJADWAL"
-    }
-    
-    emoji = severity_emoji.get(notice.severity, "ℹ️")
-    notice_type = type_text.get(notice.type, "PEMBERITAHUAN")
-    
-    message = f"""
-{emoji} *{notice_type}* {emoji}
-
-*{notice.title}*
-
-{notice.message}
-"""
-    
-    if notice.affected_area:
-        message += f"\n📍 *Area Terdampak:* {notice.affected_area}"
-    
-    if notice.start_time:
-        message += f"\n🕐 *Mulai:* {notice.start_time.strftime('%d/%m/%Y %H:%M')}"
+    plan = whatsapp_service.plan_recipients(recipients)
+    estimate = whatsapp_service.estimate_seconds(len(plan["valid"]))
     
-    if notice.end_time:
-        message += f"\n🕐 *Estimasi Selesai:* {notice.end_time.strftime('%d/%m/%Y %H:%M')}"
-    
-    message += """
-
-Untuk informasi perkembangan terbaru, silakan cek melalui link berikut:
-👉 https://rumahkitanet.site/status-jaringan
+    return NotificationResponse(
+        success=True,
+        message=f"Dry run: {len(plan['valid'])} dari {len(recipients)} pelanggan akan dikirimi pesan",
+        total_customers=len(recipients),
+        sent_count=0,
+        failed_count=0,
+        skipped_count=len(plan["skipped"]),
+        results=[SendResult(**r) for r in plan["skipped"]],
+        dry_run=DryRunSummary(
+            total_customers=len(recipients),
+            valid_count=len(plan["valid"]),
+            invalid_count=plan["invalid_count"],
+            duplicate_count=plan["duplicate_count"],
+            normalized_count=plan["normalized_count"],
+            **estimate
+        )
+    )
 
-Mohon maaf atas ketidaknyamanan ini.
-Terima kasih atas pengertiannya.
 
-_Pesan ini dikirim otomatis_
-"""
-    
-    return message.strip()
+def _resolve_media(media: Optional[str]):
+    """
+    Validasi path lampiran dari request (400 jika tidak valid)
+    """
+    if not media:
+        return None
+    try:
+        return whatsapp_service.resolve_media_path(media)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
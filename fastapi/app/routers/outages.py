@@ -0,0 +1,101 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models import NetworkNotice
+from app.schemas import OutageNoticeRequest, NetworkNoticeResponse
+from app.services.outages import outage_detector
+from app.services.scheduler import notice_scheduler
+
+router = APIRouter(tags=["outages"])
+
+# Panjang kolom title / affected_odp (string() di migration Laravel)
+MAX_COLUMN_LENGTH = 255
+# ODP yang ditulis di judul; sisanya diringkas "+N lainnya"
+TITLE_MAX_ODPS = 3
+
+
+def _outage_title(odps: list) -> str:
+    shown = ", ".join(odps[:TITLE_MAX_ODPS])
+    if len(odps) > TITLE_MAX_ODPS:
+        shown += f" +{len(odps) - TITLE_MAX_ODPS} lainnya"
+    return f"Gangguan jaringan di ODP {shown}"[:MAX_COLUMN_LENGTH]
+
+
+@router.get("/api/outages")
+async def get_outages(
+    threshold: Optional[int] = Query(None, description="Minimal pelanggan berbeda yang mengadu (default OUTAGE_THRESHOLD)")
+):
+    """
+    Daftar ODP dengan aduan gangguan di atas threshold dalam sliding window
+    """
+    return {
+        "outages": outage_detector.get_outages(threshold),
+        "detector": outage_detector.get_stats()
+    }
+
+
+@router.post("/api/outages/notice", response_model=NetworkNoticeResponse)
+async def draft_outage_notice(
+    request: OutageNoticeRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Buat NetworkNotice untuk ODP yang terdeteksi gangguan
+
+    - Jika odps tidak diisi, semua ODP di atas threshold dimasukkan
+    - Secara default notice disimpan sebagai draft (is_active = false)
+      untuk ditinjau admin sebelum dikirim
+    - Jika daftar ODP melebihi panjang kolom affected_odp (255), request
+      ditolak (400); kirim odps per kelompok untuk membuat beberapa notice
+    """
+    outages = outage_detector.get_outages(request.threshold)
+    if request.odps:
+        wanted = {odp.strip() for odp in request.odps}
+        outages = [o for o in outages if o["odp"] in wanted]
+
+    if not outages:
+        raise HTTPException(status_code=404, detail="Tidak ada ODP yang terdeteksi gangguan")
+
+    odps = [o["odp"] for o in outages]
+    affected_odp = ",".join(odps)
+    if len(affected_odp) > MAX_COLUMN_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Daftar ODP terlalu panjang ({len(odps)} ODP, {len(affected_odp)} karakter, "
+                f"maksimal {MAX_COLUMN_LENGTH}). Pecah menjadi beberapa notice dengan parameter odps."
+            )
+        )
+    customer_count = sum(o["customer_count"] for o in outages)
+    threshold = request.threshold or outage_detector.threshold
+    now = datetime.now()
+
+    notice = NetworkNotice(
+        title=_outage_title(odps),
+        message=(
+            "Kami mendeteksi gangguan jaringan di area Anda berdasarkan laporan pelanggan. "
+            "Tim teknisi sedang melakukan pengecekan dan perbaikan."
+        ),
+        type="gangguan",
+        severity="high" if customer_count >= threshold * 2 else "medium",
+        is_mass=len(odps) > 1,
+        affected_odp=affected_odp,
+        # Scheduler mengirim saat start_time; notice yang langsung diaktifkan
+        # dikirim sekarang, bukan dianggap terlewat sejak aduan pertama
+        start_time=now if request.activate else min(o["first_complaint_at"] for o in outages),
+        is_active=request.activate,
+        created_at=now,
+        updated_at=now
+    )
+    db.add(notice)
+    db.commit()
+    db.refresh(notice)
+
+    if request.activate:
+        notice_scheduler.request_refresh()
+
+    return notice
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from app.services.progress import progress_hub
+
+router = APIRouter(tags=["progress"])
+
+
+@router.get("/api/campaigns/active")
+async def get_active_campaigns():
+    """
+    Campaign yang sedang berjalan atau baru saja selesai
+    """
+    return {"campaigns": progress_hub.get_campaigns()}
+
+
+@router.websocket("/ws/campaigns/{campaign_id}")
+async def campaign_progress(websocket: WebSocket, campaign_id: str):
+    """
+    Feed progres live satu campaign
+
+    - Pesan pertama: snapshot status saat ini (jika campaign sudah ada)
+    - Selanjutnya: type "progress" berisi total berjalan dan hasil per
+      penerima sejak update sebelumnya, paling sering sekali per
+      PROGRESS_THROTTLE_SECONDS
+    - Terakhir: type "done" saat campaign selesai
+    """
+    await websocket.accept()
+    await progress_hub.subscribe(campaign_id, websocket)
+    try:
+        while True:
+            # Pesan dari client diabaikan; hanya untuk mendeteksi disconnect
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        progress_hub.unsubscribe(campaign_id, websocket)
@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+
+from app.schemas import ReceiptBatchRequest, CampaignReceiptStats
+from app.services.receipts import receipt_service
+
+router = APIRouter(tags=["receipts"])
+
+
+@router.post("/api/receipts")
+async def ingest_receipts(request: ReceiptBatchRequest):
+    """
+    Terima batch ack (sent / delivered / read) dari WhatsApp Gateway.
+    Event ditampung di memori dan ditulis ke DB secara batch.
+    """
+    for event in request.events:
+        receipt_service.add(event.campaign_id, event.phone, event.status, event.timestamp)
+
+    return {"success": True, "accepted": len(request.events)}
+
+
+@router.get("/api/receipts/stats")
+async def get_receipt_stats():
+    """
+    Statistik buffer receipt dan proses flush ke DB
+    """
+    return receipt_service.get_stats()
+
+
+@router.get("/api/campaigns/{campaign_id}/receipts", response_model=CampaignReceiptStats)
+async def get_campaign_receipts(campaign_id: str):
+    """
+    Delivered rate dan read rate untuk satu campaign
+    """
+    return receipt_service.get_campaign_stats(campaign_id)
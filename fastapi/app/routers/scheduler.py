@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+
+from app.services.scheduler import notice_scheduler
+
+router = APIRouter(tags=["scheduler"])
+
+
+@router.get("/api/scheduler/status")
+async def get_scheduler_status():
+    """
+    Status scheduler notice: jadwal start/end yang menunggu dan yang sudah disiapkan
+    """
+    return notice_scheduler.get_status()
+
+
+@router.post("/api/scheduler/refresh")
+async def refresh_scheduler():
+    """
+    Sinkronkan ulang jadwal notice dari database sekarang juga
+    (panggil setelah membuat atau mengubah pemberitahuan)
+    """
+    notice_scheduler.request_refresh()
+    return {"success": True, "message": "Sinkronisasi jadwal diminta"}
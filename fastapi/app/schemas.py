@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
 from datetime import datetime
 
 # Request Schemas
@@ -7,14 +7,26 @@ class SendNotificationRequest(BaseModel):
     notice_id: Optional[int] = None  # Jika None, ambil notice aktif terbaru
     customer_ids: Optional[List[int]] = None  # Jika None, kirim ke semua pelanggan aktif
     custom_message: Optional[str] = None  # Override message dari notice
+    media: Optional[str] = None  # Lampiran, path relatif ke folder public (mis. brosur/Brosur-1.png)
+    dry_run: bool = False  # Hitung audience & estimasi durasi tanpa mengirim
+    campaign_id: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_-]{1,64}$")  # Opsional, agar progres bisa dipantau via /ws/campaigns/{campaign_id} sejak awal
 
 class SendCustomMessageRequest(BaseModel):
     message: str
     customer_ids: Optional[List[int]] = None  # Jika None, kirim ke semua pelanggan aktif
+    media: Optional[str] = None  # Lampiran, path relatif ke folder public
+    dry_run: bool = False  # Hitung audience & estimasi durasi tanpa mengirim
+    campaign_id: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_-]{1,64}$")  # Opsional, agar progres bisa dipantau via /ws/campaigns/{campaign_id} sejak awal
+
+class OutageNoticeRequest(BaseModel):
+    odps: Optional[List[str]] = None  # Jika None, semua ODP yang melewati threshold
+    threshold: Optional[int] = None  # Override OUTAGE_THRESHOLD
+    activate: bool = False  # False = simpan sebagai draft (is_active = false)
 
 class SendToPhoneRequest(BaseModel):
     phone: str
     message: str
+    media: Optional[str] = None  # Lampiran, path relatif ke folder public
 
 # Response Schemas
 class CustomerResponse(BaseModel):
@@ -50,6 +62,16 @@ class SendResult(BaseModel):
     success: bool
     error: Optional[str] = None
 
+class DryRunSummary(BaseModel):
+    total_customers: int
+    valid_count: int  # Nomor yang akan dikirimi pesan
+    invalid_count: int  # Nomor 0 / kosong / panjang tidak valid
+    duplicate_count: int  # Nomor sama (setelah normalisasi) dengan penerima lain
+    normalized_count: int  # Nomor valid yang formatnya diubah (mis. 08xx -> 628xx)
+    estimated_seconds: float
+    seconds_per_recipient: float
+    rate_source: str  # observed (dari pengiriman sebelumnya) atau default
+
 class NotificationResponse(BaseModel):
     success: bool
     message: str
@@ -57,6 +79,8 @@ class NotificationResponse(BaseModel):
     sent_count: int
     failed_count: int
     skipped_count: int  # Untuk nomor 0 atau invalid
+    campaign_id: Optional[str] = None  # ID campaign untuk melacak receipt delivered/read
+    dry_run: Optional[DryRunSummary] = None  # Diisi jika request dry_run
     results: List[SendResult]
 
 class WhatsAppStatusResponse(BaseModel):
@@ -64,3 +88,21 @@ class WhatsAppStatusResponse(BaseModel):
     phone_number: Optional[str] = None
     message: str
     qr_code: Optional[str] = None  # Base64 QR code jika perlu scan
+
+class ReceiptEvent(BaseModel):
+    campaign_id: str
+    phone: str
+    status: Literal["sent", "delivered", "read"]
+    timestamp: Optional[datetime] = None  # Jika None, pakai waktu diterima
+
+class ReceiptBatchRequest(BaseModel):
+    events: List[ReceiptEvent]
+
+class CampaignReceiptStats(BaseModel):
+    campaign_id: str
+    sent: int
+    delivered: int
+    read: int
+    delivered_rate: float
+    read_rate: float
+    pending_events: int  # Event yang masih di buffer, belum ditulis ke DB
@@ -1,4 +1,9 @@
 # Services module
 from app.services.whatsapp import whatsapp_service
+from app.services.scheduler import notice_scheduler
+from app.services.receipts import receipt_service
+from app.services.cache import query_cache
+from app.services.outages import outage_detector
+from app.services.progress import progress_hub
 
-__all__ = ['whatsapp_service']
+__all__ = ['whatsapp_service', 'notice_scheduler', 'receipt_service', 'query_cache', 'outage_detector', 'progress_hub']
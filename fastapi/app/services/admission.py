@@ -0,0 +1,175 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+from app.config import settings
+
+# Penanda timeout default (None berarti menunggu tanpa batas)
+_DEFAULT = object()
+
+
+class AdmissionRejected(Exception):
+    """
+    Campaign ditolak karena kapasitas pengiriman penuh
+    """
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Pembatas jumlah campaign (pengiriman massal) yang berjalan bersamaan
+
+    - Maksimal SEND_MAX_CONCURRENT_CAMPAIGNS campaign aktif ke gateway
+    - Maksimal SEND_MAX_ACTIVE_RECIPIENTS total penerima yang sedang diproses
+      (campaign yang lebih besar dari batas ini tetap bisa jalan sendirian)
+    - Permintaan berlebih menunggu di antrean FIFO berukuran SEND_MAX_WAITING
+      campaign dan SEND_MAX_QUEUED_RECIPIENTS total penerima, selama
+      SEND_QUEUE_TIMEOUT_SECONDS; di luar itu langsung ditolak (429).
+      Campaign yang lebih besar dari batas penerima tetap boleh antre jika
+      antrean kosong
+    """
+
+    def __init__(self):
+        self.max_campaigns = settings.SEND_MAX_CONCURRENT_CAMPAIGNS
+        self.max_recipients = settings.SEND_MAX_ACTIVE_RECIPIENTS
+        self.max_waiting = settings.SEND_MAX_WAITING
+        self.max_queued_recipients = settings.SEND_MAX_QUEUED_RECIPIENTS
+        self.queue_timeout = settings.SEND_QUEUE_TIMEOUT_SECONDS
+
+        self.active_campaigns = 0
+        self.active_recipients = 0
+        self._waiters = deque()  # (future, jumlah penerima)
+
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self.timed_out_total = 0
+        self._avg_duration = 30.0  # Rata-rata durasi campaign (EWMA), detik
+
+    def _has_capacity(self, recipients: int) -> bool:
+        if self.active_campaigns >= self.max_campaigns:
+            return False
+        if self.active_campaigns == 0:
+            return True
+        return self.active_recipients + recipients <= self.max_recipients
+
+    def _retry_after(self) -> int:
+        # Perkiraan kasar: antrean dilayani per slot campaign
+        rounds = (len(self._waiters) // max(self.max_campaigns, 1)) + 1
+        return max(1, math.ceil(self._avg_duration * rounds))
+
+    def _acquire(self, recipients: int):
+        self.active_campaigns += 1
+        self.active_recipients += recipients
+        self.admitted_total += 1
+
+    def _release(self, recipients: int, duration: Optional[float]):
+        self.active_campaigns -= 1
+        self.active_recipients -= recipients
+        if duration is not None:
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+        self._wake()
+
+    def _queue_full(self, recipients: int) -> bool:
+        if len(self._waiters) >= self.max_waiting:
+            return True
+        queued = sum(n for _, n in self._waiters)
+        return queued > 0 and queued + recipients > self.max_queued_recipients
+
+    def _wake(self):
+        # Bangunkan antrean sesuai urutan selama kapasitas masih ada
+        while self._waiters:
+            future, waiting_recipients = self._waiters[0]
+            if not self._has_capacity(waiting_recipients):
+                break
+            self._waiters.popleft()
+            self._acquire(waiting_recipients)
+            future.set_result(True)
+
+    def _abandon(self, waiter: tuple):
+        # Keluarkan waiter yang batal menunggu; antrean di belakangnya mungkin bisa jalan
+        self._waiters.remove(waiter)
+        waiter[0].cancel()
+        self._wake()
+
+    @asynccontextmanager
+    async def admit(self, recipients: int, timeout=_DEFAULT, bounded: bool = True):
+        """
+        Tunggu giliran untuk menjalankan satu campaign
+
+        timeout: batas waktu menunggu (None = tanpa batas)
+        bounded: jika False, tidak dibatasi ukuran antrean (untuk kiriman
+        terjadwal yang tidak boleh hilang)
+        """
+        if timeout is _DEFAULT:
+            timeout = self.queue_timeout
+
+        if not self._waiters and self._has_capacity(recipients):
+            self._acquire(recipients)
+        else:
+            if bounded and self._queue_full(recipients):
+                self.rejected_total += 1
+                raise AdmissionRejected(
+                    "Terlalu banyak pengiriman berjalan. Silakan coba lagi nanti.",
+                    self._retry_after()
+                )
+
+            future = asyncio.get_running_loop().create_future()
+            waiter = (future, recipients)
+            self._waiters.append(waiter)
+            try:
+                # asyncio.wait (bukan wait_for) tidak membatalkan future dan
+                # selalu meneruskan pembatalan task, walau slot baru saja diberikan
+                await asyncio.wait((future,), timeout=timeout)
+            except asyncio.CancelledError:
+                # Request dibatalkan saat menunggu; kembalikan slot jika sempat
+                # diberikan (tanpa memengaruhi rata-rata durasi campaign)
+                if future.done():
+                    self._release(recipients, None)
+                else:
+                    self._abandon(waiter)
+                raise
+
+            # Slot bisa saja diberikan tepat saat timeout; jika belum, tolak
+            if not future.done():
+                self._abandon(waiter)
+                self.timed_out_total += 1
+                raise AdmissionRejected(
+                    "Antrean pengiriman penuh terlalu lama. Silakan coba lagi nanti.",
+                    self._retry_after()
+                )
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(recipients, time.monotonic() - started)
+
+    def get_stats(self) -> dict:
+        """
+        Status antrean pengiriman
+        """
+        return {
+            "active_campaigns": self.active_campaigns,
+            "active_recipients": self.active_recipients,
+            "waiting_campaigns": len(self._waiters),
+            "waiting_recipients": sum(n for _, n in self._waiters),
+            "max_concurrent_campaigns": self.max_campaigns,
+            "max_active_recipients": self.max_recipients,
+            "max_waiting": self.max_waiting,
+            "max_queued_recipients": self.max_queued_recipients,
+            "queue_timeout_seconds": self.queue_timeout,
+            "admitted_total": self.admitted_total,
+            "rejected_total": self.rejected_total,
+            "timed_out_total": self.timed_out_total,
+            "avg_campaign_seconds": round(self._avg_duration, 2)
+        }
+
+
+# Singleton instance
+admission_controller = AdmissionController()
@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import ReadSessionLocal
+
+# Versi tabel: MAX(updated_at) dan COUNT(*) (untuk mendeteksi penghapusan)
+# MAX dibaca langsung dari index updated_at (migration 2026_10_19_000001);
+# COUNT(*) memakai index sekunder terkecil, bukan membaca baris tabel
+_VERSION_SQL = text(
+    "SELECT "
+    "(SELECT MAX(updated_at) FROM customers), (SELECT COUNT(*) FROM customers), "
+    "(SELECT MAX(updated_at) FROM network_notices), (SELECT COUNT(*) FROM network_notices)"
+)
+
+
+class QueryCache:
+    """
+    Cache LRU + TTL di memori untuk hasil query notice dan pelanggan
+
+    Setiap entry menyimpan versi tabel (MAX(updated_at), COUNT(*)) saat
+    dimuat. Versi dicek di background setiap CACHE_CHECK_INTERVAL_SECONDS
+    dengan satu query; entry dengan versi lama dianggap miss. TTL tetap
+    berlaku sebagai batas atas data basi.
+    """
+
+    def __init__(self):
+        self.max_entries = settings.CACHE_MAX_ENTRIES
+        self.ttl = settings.CACHE_TTL_SECONDS
+        self.check_interval = settings.CACHE_CHECK_INTERVAL_SECONDS
+
+        self._entries: "OrderedDict[Hashable, Tuple[float, tuple, Any]]" = OrderedDict()
+        self._versions: Dict[str, tuple] = {}
+        self._lock = threading.Lock()  # Loader scheduler berjalan di thread terpisah
+        self._task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.last_check: Optional[datetime] = None
+
+    def start(self):
+        """
+        Jalankan pengecekan versi tabel di background
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Hentikan pengecekan versi tabel
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_or_load(self, key: Hashable, tables: Tuple[str, ...], loader: Callable[[], Any]) -> Any:
+        """
+        Ambil hasil dari cache, atau jalankan loader dan simpan hasilnya
+
+        tables: tabel yang menjadi sumber data; perubahan di salah satunya
+        membuat entry ini tidak valid
+        """
+        version = tuple(self._versions.get(table) for table in tables)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, entry_version, value = entry
+                if expires_at > time.monotonic() and entry_version == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+
+        value = loader()
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, value)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return value
+
+    def clear(self):
+        """
+        Kosongkan seluruh cache
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _load_versions(self) -> Dict[str, tuple]:
+        db = ReadSessionLocal()
+        try:
+            row = db.execute(_VERSION_SQL).one()
+        finally:
+            db.close()
+        return {
+            "customers": (row[0], row[1]),
+            "network_notices": (row[2], row[3])
+        }
+
+    async def check_versions(self):
+        """
+        Cek versi tabel; entry yang bergantung pada tabel yang berubah
+        otomatis menjadi miss pada akses berikutnya
+        """
+        versions = await asyncio.to_thread(self._load_versions)
+        self.last_check = datetime.now()
+
+        for table, version in versions.items():
+            if table in self._versions and self._versions[table] != version:
+                self.invalidations += 1
+            self._versions[table] = version
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check_versions()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Gagal cek versi cache: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    def get_stats(self) -> dict:
+        """
+        Statistik hit/miss cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "ttl_seconds": self.ttl,
+            "check_interval_seconds": self.check_interval,
+            "last_check": self.last_check,
+            "versions": {
+                table: {"max_updated_at": version[0], "count": version[1]}
+                for table, version in self._versions.items()
+            }
+        }
+
+
+# Singleton instance
+query_cache = QueryCache()
@@ -0,0 +1,100 @@
+import asyncio
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+from app.services.admission import admission_controller
+from app.services.progress import progress_hub
+from app.services.receipts import receipt_service
+from app.services.whatsapp import whatsapp_service
+
+
+# campaign_id yang sedang diproses (termasuk yang masih menunggu admission)
+_active_ids = set()
+
+
+class CampaignConflict(Exception):
+    """
+    campaign_id dari client sudah dipakai campaign lain
+    """
+
+    def __init__(self, campaign_id: str):
+        super().__init__(f"campaign_id '{campaign_id}' sudah dipakai. Gunakan ID lain.")
+        self.message = str(self)
+        self.campaign_id = campaign_id
+
+
+def new_campaign_id() -> str:
+    """
+    Buat ID unik untuk satu pengiriman massal (campaign)
+    """
+    return uuid.uuid4().hex
+
+
+def _on_progress(campaign_id: str, results: List[dict]):
+    # Dipanggil setiap kali gateway mengembalikan hasil satu chunk
+    receipt_service.record_sent(campaign_id, results)
+    progress_hub.publish(campaign_id, results)
+
+
+async def run_campaign(
+    recipients: List[dict],
+    message: str,
+    campaign_id: Optional[str] = None,
+    scheduled: bool = False,
+    media_path: Optional[Path] = None
+) -> dict:
+    """
+    Kirim pesan ke banyak penerima sebagai satu campaign
+
+    - Campaign harus melewati admission control; jika kapasitas penuh,
+      AdmissionRejected dilempar (dijawab 429 oleh aplikasi)
+    - campaign_id dari client yang sudah dipakai (sedang berjalan, masih
+      tersimpan di progress_hub, atau sudah punya receipt) ditolak dengan
+      CampaignConflict (dijawab 409)
+    - scheduled=True untuk kiriman terjadwal: menunggu giliran tanpa batas
+      waktu dan tidak dibatasi ukuran antrean
+    - media_path (opsional) diupload sekali ke gateway untuk seluruh penerima
+    - Hasil yang sukses dicatat sebagai receipt "sent" begitu setiap chunk
+      selesai dikirim, sehingga delivered rate dan read rate bisa dihitung
+      dari ack gateway selama campaign masih berjalan
+    - Progres per penerima dipublikasikan ke progress_hub sehingga bisa
+      dipantau live lewat /ws/campaigns/{campaign_id}
+    """
+    if campaign_id:
+        # ID dari client tidak boleh menimpa progres atau receipt campaign lain
+        has_receipts = await asyncio.to_thread(receipt_service.has_campaign, campaign_id)
+        # Dicek setelah query agar request bersamaan dengan ID sama tidak lolos
+        if has_receipts or campaign_id in _active_ids or progress_hub.has_campaign(campaign_id):
+            raise CampaignConflict(campaign_id)
+    else:
+        campaign_id = new_campaign_id()
+
+    if scheduled:
+        admission = admission_controller.admit(len(recipients), timeout=None, bounded=False)
+    else:
+        admission = admission_controller.admit(len(recipients))
+
+    _active_ids.add(campaign_id)
+    try:
+        async with admission:
+            progress_hub.begin(campaign_id, len(recipients))
+            status = "failed"  # Error saat mengirim
+            try:
+                results = await whatsapp_service.send_bulk(
+                    recipients,
+                    message,
+                    campaign_id=campaign_id,
+                    media_path=media_path,
+                    on_progress=lambda chunk: _on_progress(campaign_id, chunk)
+                )
+                status = "done"
+            finally:
+                progress_hub.finish(campaign_id, status)
+    finally:
+        _active_ids.discard(campaign_id)
+
+    return {
+        "campaign_id": campaign_id,
+        "results": results
+    }
@@ -0,0 +1,168 @@
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import Customer, NetworkNotice
+from app.schemas import NetworkNoticeResponse
+from app.services.cache import query_cache
+
+
+def format_notice_message(notice: NetworkNotice) -> str:
+    """
+    Format pesan dari NetworkNotice
+    """
+    severity_emoji = {
+        "low": "ℹ️",
+        "medium": "⚠️",
+        "high": "🔴",
+        "critical": "🚨"
+    }
+
+    type_text = {
+        "gangguan": "GANGGUAN JARINGAN",
+        "maintenance": "MAINTENANCE TERJADWAL"
+    }
+
+    emoji = severity_emoji.get(notice.severity, "ℹ️")
+    notice_type = type_text.get(notice.type, "PEMBERITAHUAN")
+
+    message = f"""
+{emoji} *{notice_type}* {emoji}
+
+*{notice.title}*
+
+{notice.message}
+"""
+
+    if notice.affected_area:
+        message += f"\n📍 *Area Terdampak:* {notice.affected_area}"
+
+    if notice.start_time:
+        message += f"\n🕐 *Mulai:* {notice.start_time.strftime('%d/%m/%Y %H:%M')}"
+
+    if notice.end_time:
+        message += f"\n🕐 *Estimasi Selesai:* {notice.end_time.strftime('%d/%m/%Y %H:%M')}"
+
+    message += """
+
+Untuk informasi perkembangan terbaru, silakan cek melalui link berikut:
+👉 https://rumahkitanet.site/status-jaringan
+
+Mohon maaf atas ketidaknyamanan ini.
+Terima kasih atas pengertiannya.
+
+_Pesan ini dikirim otomatis_
+"""
+
+    return message.strip()
+
+
+def format_restored_message(notice: NetworkNotice) -> str:
+    """
+    Format pesan "layanan pulih" yang dikirim saat end_time notice tercapai
+    """
+    type_text = {
+        "gangguan": "Gangguan jaringan",
+        "maintenance": "Maintenance terjadwal"
+    }
+
+    notice_type = type_text.get(notice.type, "Gangguan")
+
+    message = f"""
+✅ *LAYANAN PULIH* ✅
+
+*{notice.title}*
+
+{notice_type} telah selesai. Layanan internet Anda sudah kembali normal.
+"""
+
+    if notice.affected_area:
+        message += f"\n📍 *Area:* {notice.affected_area}"
+
+    message += """
+
+Jika koneksi Anda masih bermasalah, silakan restart modem atau hubungi kami.
+Terima kasih atas kesabaran Anda.
+
+_Pesan ini dikirim otomatis_
+"""
+
+    return message.strip()
+
+
+def get_notice(db: Session, notice_id: int) -> Optional[NetworkNoticeResponse]:
+    """
+    Ambil notice berdasarkan ID (melalui query cache)
+    """
+    def load():
+        notice = db.query(NetworkNotice).filter(NetworkNotice.id == notice_id).first()
+        return NetworkNoticeResponse.model_validate(notice) if notice else None
+
+    return query_cache.get_or_load(("notice", notice_id), ("network_notices",), load)
+
+
+def get_latest_active_notice(db: Session) -> Optional[NetworkNoticeResponse]:
+    """
+    Ambil notice aktif terbaru (melalui query cache)
+    """
+    def load():
+        notice = db.query(NetworkNotice).filter(
+            NetworkNotice.is_active == True
+        ).order_by(NetworkNotice.created_at.desc()).first()
+        return NetworkNoticeResponse.model_validate(notice) if notice else None
+
+    return query_cache.get_or_load(("latest_active_notice",), ("network_notices",), load)
+
+
+def parse_odp_list(affected_odp: Optional[str]) -> List[str]:
+    """
+    Pecah kolom affected_odp (comma separated) menjadi list ODP
+    """
+    if not affected_odp:
+        return []
+    return [odp.strip() for odp in affected_odp.split(',') if odp.strip()]
+
+
+def query_notice_audience(
+    db: Session,
+    notice: Optional[NetworkNotice] = None,
+    customer_ids: Optional[List[int]] = None,
+    odp: Optional[str] = None
+) -> List[dict]:
+    """
+    Ambil daftar penerima (recipients) untuk sebuah pengiriman
+
+    - Hanya pelanggan aktif
+    - customer_ids membatasi ke pelanggan tertentu
+    - Jika notice memiliki affected_odp dan customer_ids tidak diisi,
+      penerima dibatasi ke ODP tersebut
+    - odp membatasi ke satu ODP tertentu
+
+    Hasil disimpan di query cache sehingga dry run dan pengiriman
+    sesudahnya memakai audience yang sama tanpa query ulang.
+    """
+    odp_list = None
+    if notice is not None and notice.affected_odp and not customer_ids:
+        odp_list = tuple(parse_odp_list(notice.affected_odp))
+
+    def load():
+        query = db.query(Customer.id, Customer.name, Customer.phone).filter(
+            Customer.is_active == True
+        )
+
+        if customer_ids:
+            query = query.filter(Customer.id.in_(customer_ids))
+
+        if odp_list:
+            query = query.filter(Customer.odp.in_(odp_list))
+
+        if odp:
+            query = query.filter(Customer.odp == odp)
+
+        return [
+            {"phone": c.phone, "name": c.name, "id": c.id}
+            for c in query.all()
+        ]
+
+    key = ("audience", tuple(sorted(customer_ids)) if customer_ids else None, odp_list, odp)
+    return query_cache.get_or_load(key, ("customers",), load)
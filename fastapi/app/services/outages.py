@@ -0,0 +1,227 @@
+import asyncio
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.database import ReadSessionLocal
+from app.models import Complaint, Customer
+
+# Complaint dengan id di bawah high-water mark dibaca ulang sejauh ini,
+# untuk menangkap insert yang commit-nya terlambat (auto increment tidak berurutan)
+ID_OVERLAP = 20
+
+
+class OutageDetector:
+    """
+    Deteksi gangguan per ODP dari aduan kategori "gangguan"
+
+    - Aduan baru dibaca bertahap berdasarkan id > high-water mark
+      (range primary key), tidak pernah memindai ulang seluruh tabel
+    - Jumlah pelanggan yang mengadu per ODP dihitung dalam sliding window
+      OUTAGE_WINDOW_MINUTES di memori
+    - ODP dengan pelanggan mengadu >= OUTAGE_THRESHOLD dianggap gangguan
+    """
+
+    def __init__(self):
+        self.window = timedelta(minutes=settings.OUTAGE_WINDOW_MINUTES)
+        self.threshold = settings.OUTAGE_THRESHOLD
+        self.poll_interval = settings.OUTAGE_POLL_SECONDS
+        self.batch_size = settings.OUTAGE_BATCH_SIZE
+
+        self.high_water_mark: Optional[int] = None
+        self._events: Dict[str, deque] = {}  # odp -> deque[(created_at, complaint_id, customer_id)]
+        self._customers: Dict[str, Counter] = {}  # odp -> jumlah aduan per customer_id
+        self._seen_ids = set()
+
+        self._task: Optional[asyncio.Task] = None
+        self.complaints_processed = 0
+        self.last_poll: Optional[datetime] = None
+
+    def start(self):
+        """
+        Jalankan agregasi aduan di background
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Hentikan agregasi aduan
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Gagal membaca aduan: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def poll(self):
+        """
+        Baca aduan baru dan perbarui window per ODP
+
+        Query dijalankan di thread; state window hanya diubah di event loop.
+        """
+        if self.high_water_mark is None:
+            rows, high_water_mark = await asyncio.to_thread(self._fetch_backfill)
+            for row in reversed(rows):
+                self._ingest(row)
+            self.high_water_mark = high_water_mark
+        else:
+            rows = await asyncio.to_thread(self._fetch_new, max(self.high_water_mark - ID_OVERLAP, 0))
+            for row in rows:
+                self._ingest(row)
+                self.high_water_mark = max(self.high_water_mark, row.id)
+
+        self.last_poll = datetime.now()
+        self._prune(self.last_poll)
+
+    def _query(self, db):
+        return db.query(
+            Complaint.id,
+            Complaint.customer_id,
+            Complaint.category,
+            Complaint.created_at,
+            Customer.odp
+        ).outerjoin(Customer, Customer.id == Complaint.customer_id)
+
+    def _fetch_backfill(self) -> tuple:
+        """
+        Ambil aduan dalam window awal dengan menelusuri id menurun,
+        berhenti begitu melewati batas window
+        """
+        cutoff = datetime.now() - self.window
+        high_water_mark = 0
+        cursor = None
+        result = []
+
+        db = ReadSessionLocal()
+        try:
+            while True:
+                query = self._query(db)
+                if cursor is not None:
+                    query = query.filter(Complaint.id < cursor)
+                rows = query.order_by(Complaint.id.desc()).limit(self.batch_size).all()
+
+                if not rows:
+                    break
+
+                high_water_mark = max(high_water_mark, rows[0].id)
+                result.extend(row for row in rows if row.created_at and row.created_at >= cutoff)
+
+                cursor = rows[-1].id
+                oldest = rows[-1].created_at
+                if len(rows) < self.batch_size or (oldest and oldest < cutoff):
+                    break
+        finally:
+            db.close()
+
+        return result, high_water_mark
+
+    def _fetch_new(self, cursor: int) -> list:
+        """
+        Ambil aduan dengan id > cursor secara bertahap
+        """
+        result = []
+
+        db = ReadSessionLocal()
+        try:
+            while True:
+                rows = self._query(db).filter(
+                    Complaint.id > cursor
+                ).order_by(Complaint.id).limit(self.batch_size).all()
+
+                result.extend(rows)
+                if len(rows) < self.batch_size:
+                    break
+                cursor = rows[-1].id
+        finally:
+            db.close()
+
+        return result
+
+    def _ingest(self, row):
+        if row.id in self._seen_ids:
+            return
+        self._seen_ids.add(row.id)
+        self.complaints_processed += 1
+
+        if row.category != "gangguan" or not row.odp or not row.created_at:
+            return
+        if row.created_at < datetime.now() - self.window:
+            return  # Sudah di luar window (mis. terbaca ulang dari overlap)
+
+        odp = row.odp.strip()
+        events = self._events.setdefault(odp, deque())
+        events.append((row.created_at, row.id, row.customer_id))
+        self._customers.setdefault(odp, Counter())[row.customer_id] += 1
+
+    def _prune(self, now: datetime):
+        cutoff = now - self.window
+
+        for odp in list(self._events):
+            events = self._events[odp]
+            customers = self._customers[odp]
+            while events and events[0][0] < cutoff:
+                _, complaint_id, customer_id = events.popleft()
+                customers[customer_id] -= 1
+                if customers[customer_id] <= 0:
+                    del customers[customer_id]
+            if not events:
+                del self._events[odp]
+                del self._customers[odp]
+
+        # id di bawah jangkauan overlap tidak akan dibaca lagi
+        if self.high_water_mark is not None:
+            floor = self.high_water_mark - ID_OVERLAP
+            self._seen_ids = {i for i in self._seen_ids if i > floor}
+
+    def get_outages(self, threshold: Optional[int] = None) -> List[dict]:
+        """
+        Daftar ODP dengan jumlah pelanggan mengadu >= threshold dalam window
+        """
+        threshold = threshold or self.threshold
+        self._prune(datetime.now())
+
+        outages = [
+            {
+                "odp": odp,
+                "customer_count": len(self._customers[odp]),
+                "complaint_count": len(events),
+                "first_complaint_at": events[0][0],
+                "last_complaint_at": events[-1][0]
+            }
+            for odp, events in self._events.items()
+            if len(self._customers[odp]) >= threshold
+        ]
+        outages.sort(key=lambda o: o["customer_count"], reverse=True)
+        return outages
+
+    def get_stats(self) -> dict:
+        """
+        Status agregator aduan
+        """
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "high_water_mark": self.high_water_mark,
+            "window_minutes": int(self.window.total_seconds() // 60),
+            "threshold": self.threshold,
+            "tracked_odps": len(self._events),
+            "complaints_processed": self.complaints_processed,
+            "last_poll": self.last_poll
+        }
+
+
+# Singleton instance
+outage_detector = OutageDetector()
@@ -0,0 +1,199 @@
+import asyncio
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from fastapi import WebSocket
+
+from app.config import settings
+from app.services.whatsapp import SKIP_ERRORS
+
+
+class CampaignProgress:
+    """
+    Status berjalan satu campaign
+    """
+
+    def __init__(self, campaign_id: str, total: int):
+        self.campaign_id = campaign_id
+        self.total = total
+        self.status = "running"  # running, done, failed
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self.started_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.pending_results: List[dict] = []  # Hasil baru sejak broadcast terakhir
+
+    def snapshot(self) -> dict:
+        return {
+            "campaign_id": self.campaign_id,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.sent + self.failed + self.skipped,
+            "sent": self.sent,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class ProgressHub:
+    """
+    Broadcast progres campaign ke banyak viewer WebSocket
+
+    Hasil per penerima digabung dan dikirim paling sering sekali setiap
+    PROGRESS_THROTTLE_SECONDS per campaign. Pesan di-encode sekali lalu
+    dikirim ke semua viewer, sehingga biaya tidak bertambah per hasil.
+    Pengiriman ke satu viewer diurutkan dengan lock per viewer agar pesan
+    "done" tidak mendahului "progress" sebelumnya.
+    """
+
+    def __init__(self):
+        self.throttle = settings.PROGRESS_THROTTLE_SECONDS
+        self.retention = settings.PROGRESS_RETENTION_SECONDS
+
+        self._campaigns: Dict[str, CampaignProgress] = {}
+        self._viewers: Dict[str, Set[WebSocket]] = {}
+        self._flush_handles: Dict[str, asyncio.TimerHandle] = {}
+        self._send_locks: Dict[WebSocket, asyncio.Lock] = {}
+        self._send_tasks = set()
+
+    def begin(self, campaign_id: str, total: int):
+        """
+        Daftarkan campaign yang lolos admission control dan mulai mengirim
+        """
+        self._campaigns[campaign_id] = CampaignProgress(campaign_id, total)
+        self._schedule_flush(campaign_id)
+
+    def has_campaign(self, campaign_id: str) -> bool:
+        """
+        Apakah campaign masih dilacak (berjalan atau dalam masa retensi)
+        """
+        return campaign_id in self._campaigns
+
+    def publish(self, campaign_id: str, results: List[dict]):
+        """
+        Tambahkan hasil per penerima; broadcast ditunda sesuai throttle
+        """
+        progress = self._campaigns.get(campaign_id)
+        if progress is None:
+            return
+
+        for result in results:
+            if result.get("success"):
+                progress.sent += 1
+            elif result.get("error") in SKIP_ERRORS:
+                progress.skipped += 1
+            else:
+                progress.failed += 1
+
+        if self._viewers.get(campaign_id):
+            progress.pending_results.extend(results)
+        self._schedule_flush(campaign_id)
+
+    def finish(self, campaign_id: str, status: str = "done"):
+        """
+        Tandai campaign selesai (done/failed) dan kirim status akhir segera
+        """
+        progress = self._campaigns.get(campaign_id)
+        if progress is None:
+            return
+
+        progress.status = status
+        progress.finished_at = datetime.now()
+
+        handle = self._flush_handles.pop(campaign_id, None)
+        if handle:
+            handle.cancel()
+        self._flush(campaign_id)
+
+        # Simpan sebentar agar viewer yang terlambat tetap melihat hasil akhir
+        asyncio.get_running_loop().call_later(self.retention, self._forget, campaign_id)
+
+    def _forget(self, campaign_id: str):
+        progress = self._campaigns.get(campaign_id)
+        if progress is not None and progress.finished_at is not None:
+            del self._campaigns[campaign_id]
+
+    def _schedule_flush(self, campaign_id: str):
+        if campaign_id in self._flush_handles:
+            return
+        loop = asyncio.get_running_loop()
+        self._flush_handles[campaign_id] = loop.call_later(self.throttle, self._flush, campaign_id)
+
+    def _flush(self, campaign_id: str):
+        self._flush_handles.pop(campaign_id, None)
+        progress = self._campaigns.get(campaign_id)
+        viewers = self._viewers.get(campaign_id)
+        if progress is None:
+            return
+
+        results, progress.pending_results = progress.pending_results, []
+        if not viewers:
+            return
+
+        payload = json.dumps({
+            "type": "progress" if progress.finished_at is None else "done",
+            **progress.snapshot(),
+            "results": results
+        })
+        for websocket in list(viewers):
+            task = asyncio.create_task(self._send(campaign_id, websocket, payload))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+
+    async def _send(self, campaign_id: str, websocket: WebSocket, payload: str):
+        lock = self._send_locks.get(websocket)
+        if lock is None:
+            return  # Viewer sudah dilepas
+
+        # Lock asyncio melayani antrean secara FIFO, jadi urutan pesan terjaga
+        async with lock:
+            if websocket not in self._viewers.get(campaign_id, ()):
+                return
+            try:
+                await asyncio.wait_for(websocket.send_text(payload), timeout=5)
+            except Exception:
+                # Viewer lambat atau terputus dilepas
+                self.unsubscribe(campaign_id, websocket)
+
+    async def subscribe(self, campaign_id: str, websocket: WebSocket):
+        """
+        Daftarkan viewer; kirim snapshot saat ini jika campaign sudah ada
+        """
+        self._viewers.setdefault(campaign_id, set()).add(websocket)
+        self._send_locks[websocket] = asyncio.Lock()
+
+        progress = self._campaigns.get(campaign_id)
+        if progress is not None:
+            await self._send(campaign_id, websocket, json.dumps({
+                "type": "snapshot" if progress.finished_at is None else "done",
+                **progress.snapshot(),
+                "results": []
+            }))
+
+    def unsubscribe(self, campaign_id: str, websocket: WebSocket):
+        """
+        Lepas viewer
+        """
+        self._send_locks.pop(websocket, None)
+        viewers = self._viewers.get(campaign_id)
+        if viewers is not None:
+            viewers.discard(websocket)
+            if not viewers:
+                del self._viewers[campaign_id]
+
+    def get_campaigns(self) -> List[dict]:
+        """
+        Daftar campaign yang sedang/baru saja berjalan
+        """
+        return [
+            {**progress.snapshot(), "viewers": len(self._viewers.get(campaign_id, ()))}
+            for campaign_id, progress in self._campaigns.items()
+        ]
+
+
+# Singleton instance
+progress_hub = ProgressHub()
@@ -0,0 +1,240 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import MessageReceipt
+from app.services.whatsapp import whatsapp_service
+
+# Status receipt -> kolom di tabel message_receipts
+STATUS_COLUMNS = {
+    "sent": "sent_at",
+    "delivered": "delivered_at",
+    "read": "read_at"
+}
+
+
+class ReceiptService:
+    """
+    Penampung receipt (sent / delivered / read) dari WhatsApp Gateway
+
+    Event ditampung di memori dan digabung per (campaign_id, phone), lalu
+    ditulis ke tabel message_receipts dengan multi-row upsert saat jumlahnya
+    mencapai RECEIPT_BATCH_SIZE atau setiap RECEIPT_FLUSH_INTERVAL_SECONDS.
+    Tidak ada round trip DB per event.
+    """
+
+    def __init__(self):
+        self.batch_size = settings.RECEIPT_BATCH_SIZE
+        self.flush_interval = settings.RECEIPT_FLUSH_INTERVAL_SECONDS
+
+        self._buffer: Dict[Tuple[str, str], dict] = {}
+        self._flush_requested = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.events_received = 0
+        self.rows_written = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.last_flush_at: Optional[datetime] = None
+        self.last_flush_ms: Optional[float] = None
+
+    def start(self):
+        """
+        Jalankan loop flush di background
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Hentikan loop flush dan tulis sisa buffer ke DB
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def add(self, campaign_id: str, phone: str, status: str, timestamp: Optional[datetime] = None):
+        """
+        Tambahkan satu event receipt ke buffer
+        """
+        column = STATUS_COLUMNS.get(status)
+        if column is None or not campaign_id:
+            return
+
+        phone = whatsapp_service.normalize_phone(phone)
+        if not phone:
+            return
+
+        if timestamp is None:
+            timestamp = datetime.now()
+        elif timestamp.tzinfo is not None:
+            # Ack gateway berformat ISO UTC; simpan sebagai waktu lokal naive
+            # seperti sent_at dan kolom timestamp Laravel lainnya
+            timestamp = timestamp.astimezone().replace(tzinfo=None)
+        row = self._buffer.setdefault((campaign_id, phone), {})
+        self._merge(row, column, timestamp)
+
+        # Pesan yang sudah dibaca pasti sudah terkirim ke perangkat
+        if column == "read_at":
+            self._merge(row, "delivered_at", timestamp)
+
+        self.events_received += 1
+        if len(self._buffer) >= self.batch_size:
+            self._flush_requested.set()
+
+    def record_sent(self, campaign_id: str, results: List[dict]):
+        """
+        Catat hasil kirim yang sukses sebagai receipt "sent"
+        (penyebut untuk delivered rate dan read rate)
+        """
+        now = datetime.now()
+        for result in results:
+            if result.get("success"):
+                self.add(campaign_id, result.get("phone", ""), "sent", now)
+
+    @staticmethod
+    def _merge(row: dict, column: str, timestamp: datetime):
+        current = row.get(column)
+        if current is None or timestamp < current:
+            row[column] = timestamp
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    async def flush(self):
+        """
+        Tulis seluruh buffer ke DB
+        """
+        if not self._buffer:
+            return
+
+        buffer, self._buffer = self._buffer, {}
+        now = datetime.now()
+        rows = [
+            {
+                "campaign_id": campaign_id,
+                "phone": phone,
+                "sent_at": row.get("sent_at"),
+                "delivered_at": row.get("delivered_at"),
+                "read_at": row.get("read_at"),
+                "created_at": now,
+                "updated_at": now
+            }
+            for (campaign_id, phone), row in buffer.items()
+        ]
+
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except Exception as e:
+            # Kembalikan ke buffer agar dicoba lagi pada flush berikutnya
+            self.flush_errors += 1
+            for key, row in buffer.items():
+                pending = self._buffer.setdefault(key, {})
+                for column, timestamp in row.items():
+                    self._merge(pending, column, timestamp)
+            print(f"❌ Gagal menulis receipt ({len(rows)} baris): {e}")
+            return
+
+        self.flush_count += 1
+        self.rows_written += len(rows)
+        self.last_flush_at = datetime.now()
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def _write(self, rows: List[dict]):
+        table = MessageReceipt.__table__
+        db = SessionLocal()
+        try:
+            for i in range(0, len(rows), self.batch_size):
+                stmt = insert(table).values(rows[i:i + self.batch_size])
+                # Pertahankan timestamp paling awal yang sudah tersimpan
+                stmt = stmt.on_duplicate_key_update(
+                    sent_at=func.coalesce(table.c.sent_at, stmt.inserted.sent_at),
+                    delivered_at=func.coalesce(table.c.delivered_at, stmt.inserted.delivered_at),
+                    read_at=func.coalesce(table.c.read_at, stmt.inserted.read_at),
+                    updated_at=stmt.inserted.updated_at
+                )
+                db.execute(stmt)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def has_campaign(self, campaign_id: str) -> bool:
+        """
+        Apakah campaign_id sudah punya receipt (di buffer atau di DB)
+        """
+        if any(key[0] == campaign_id for key in self._buffer):
+            return True
+
+        db = SessionLocal()
+        try:
+            return db.query(
+                db.query(MessageReceipt.id).filter(MessageReceipt.campaign_id == campaign_id).exists()
+            ).scalar()
+        finally:
+            db.close()
+
+    def get_campaign_stats(self, campaign_id: str) -> dict:
+        """
+        Hitung delivered rate dan read rate untuk satu campaign
+        """
+        db = SessionLocal()
+        try:
+            sent, delivered, read = db.query(
+                func.count(MessageReceipt.sent_at),
+                func.count(MessageReceipt.delivered_at),
+                func.count(MessageReceipt.read_at)
+            ).filter(MessageReceipt.campaign_id == campaign_id).one()
+        finally:
+            db.close()
+
+        pending = sum(1 for key in self._buffer if key[0] == campaign_id)
+        return {
+            "campaign_id": campaign_id,
+            "sent": sent,
+            "delivered": delivered,
+            "read": read,
+            "delivered_rate": round(delivered / sent, 4) if sent else 0.0,
+            "read_rate": round(read / sent, 4) if sent else 0.0,
+            "pending_events": pending
+        }
+
+    def get_stats(self) -> dict:
+        """
+        Statistik buffer dan proses flush
+        """
+        return {
+            "buffered": len(self._buffer),
+            "events_received": self.events_received,
+            "rows_written": self.rows_written,
+            "flush_count": self.flush_count,
+            "flush_errors": self.flush_errors,
+            "last_flush_at": self.last_flush_at,
+            "last_flush_ms": self.last_flush_ms,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval
+        }
+
+
+# Singleton instance
+receipt_service = ReceiptService()
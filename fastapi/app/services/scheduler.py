@@ -0,0 +1,328 @@
+import asyncio
+import heapq
+import itertools
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import or_
+
+from app.config import settings
+from app.database import ReadSessionLocal
+from app.models import NetworkNotice
+from app.services.notices import (
+    format_notice_message,
+    format_restored_message,
+    query_notice_audience
+)
+from app.services.campaigns import CampaignConflict, run_campaign
+
+# Jenis event per notice
+KIND_START = "start"  # Kirim notice saat start_time
+KIND_END = "end"  # Kirim "layanan pulih" saat end_time
+
+# Aksi di dalam heap
+ACTION_PREPARE = "prepare"
+ACTION_DISPATCH = "dispatch"
+
+# Jadwal yang terlewat saat layanan mati dilaporkan sejauh ini ke belakang
+MISSED_LOOKBACK = timedelta(days=1)
+
+
+class NoticeScheduler:
+    """
+    Scheduler background untuk NetworkNotice
+
+    - Jadwal (start_time / end_time) disinkronkan dari DB dengan satu query
+      setiap NOTICE_SCHEDULER_REFRESH_SECONDS, bukan polling per notice
+    - Event disimpan di min-heap sehingga loop hanya tidur sampai event
+      terdekat, berapapun jumlah notice yang menunggu
+    - Audience dan pesan disiapkan NOTICE_PREWARM_SECONDS sebelum jadwal,
+      sehingga pengiriman langsung dimulai saat waktunya tiba
+    - Jadwal yang terlewat saat layanan mati/restart tetap dikirim jika
+      belum lewat NOTICE_MISSED_GRACE_MINUTES (notice start tidak dikirim
+      jika end_time sudah lewat); sisanya dicatat di get_status()["missed"]
+    - campaign_id kiriman terjadwal ditentukan dari notice & waktu jadwal,
+      sehingga jadwal yang sudah pernah terkirim tidak dikirim ulang
+    """
+
+    def __init__(self):
+        self.refresh_interval = settings.NOTICE_SCHEDULER_REFRESH_SECONDS
+        self.prewarm_seconds = settings.NOTICE_PREWARM_SECONDS
+        self.missed_grace = timedelta(minutes=settings.NOTICE_MISSED_GRACE_MINUTES)
+
+        self._heap = []  # (waktu, seq, aksi, key, waktu kirim)
+        self._seq = itertools.count()
+        self._pending: Dict[Tuple[int, str], datetime] = {}  # key -> waktu kirim
+        self._versions: Dict[Tuple[int, str], Optional[datetime]] = {}  # key -> updated_at
+        self._prepared: Dict[Tuple[int, str], dict] = {}  # key -> audience & pesan
+        self._dispatched = set()
+        self._missed: Dict[Tuple[int, str], dict] = {}  # key -> jadwal terlewat yang tidak dikirim
+        self._running_tasks = set()
+
+        self._wakeup = asyncio.Event()
+        self._refresh_requested = False
+        self._task: Optional[asyncio.Task] = None
+        self._started_at: Optional[datetime] = None
+        self.last_refresh: Optional[datetime] = None
+
+    def start(self):
+        """
+        Jalankan loop scheduler di background
+        """
+        if self._task is None:
+            self._started_at = datetime.now()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Hentikan loop scheduler
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def request_refresh(self):
+        """
+        Minta sinkronisasi jadwal segera (mis. setelah admin membuat notice)
+        """
+        self._refresh_requested = True
+        self._wakeup.set()
+
+    def mark_sent(self, notice_id: int):
+        """
+        Notice sudah dikirim manual (/api/send/notification); jadwal
+        start_time-nya tidak perlu dikirim lagi oleh scheduler
+        """
+        key = (notice_id, KIND_START)
+        self._dispatched.add(key)
+        self._forget(key)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_refresh = 0.0
+
+        while True:
+            try:
+                if self._refresh_requested or loop.time() >= next_refresh:
+                    self._refresh_requested = False
+                    await self.refresh()
+                    next_refresh = loop.time() + self.refresh_interval
+
+                await self._process_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Scheduler error: {e}")
+
+            timeout = next_refresh - loop.time()
+            if self._heap:
+                until_next = (self._heap[0][0] - datetime.now()).total_seconds()
+                timeout = min(timeout, until_next)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    def _load_schedule(self) -> list:
+        since = self._started_at - max(self.missed_grace, MISSED_LOOKBACK)
+        db = ReadSessionLocal()
+        try:
+            return db.query(
+                NetworkNotice.id,
+                NetworkNotice.start_time,
+                NetworkNotice.end_time,
+                NetworkNotice.updated_at
+            ).filter(
+                NetworkNotice.is_active == True,
+                or_(
+                    NetworkNotice.start_time >= since,
+                    NetworkNotice.end_time >= since
+                )
+            ).all()
+        finally:
+            db.close()
+
+    async def refresh(self):
+        """
+        Sinkronkan jadwal dari DB ke heap
+
+        Entry lama di heap tidak dihapus, tetapi diabaikan saat diambil
+        jika waktunya tidak lagi sama dengan _pending (lazy deletion).
+        """
+        rows = await asyncio.to_thread(self._load_schedule)
+        self.last_refresh = datetime.now()
+
+        grace_cutoff = self._started_at - self.missed_grace
+        schedule = {}
+        for notice_id, start_time, end_time, updated_at in rows:
+            for kind, fire_at in ((KIND_START, start_time), (KIND_END, end_time)):
+                if not fire_at:
+                    continue
+                key = (notice_id, kind)
+                if key in self._dispatched:
+                    continue
+
+                # Jadwal yang lewat saat layanan mati
+                reason = None
+                if fire_at < self._started_at:
+                    if key in self._missed:
+                        continue
+                    if fire_at < grace_cutoff:
+                        reason = "Terlewat saat layanan mati (melebihi grace)"
+                    elif kind == KIND_START and end_time and end_time <= self.last_refresh:
+                        reason = "Terlewat saat layanan mati dan gangguan sudah selesai"
+
+                if reason:
+                    self._record_missed(key, fire_at, reason)
+                else:
+                    schedule[key] = (fire_at, updated_at)
+
+        for key in list(self._pending):
+            if key not in schedule:
+                self._forget(key)
+
+        for key, (fire_at, updated_at) in schedule.items():
+            if key in self._dispatched:
+                continue
+
+            if self._versions.get(key) != updated_at:
+                self._prepared.pop(key, None)
+
+            if self._pending.get(key) != fire_at or self._versions.get(key) != updated_at:
+                self._pending[key] = fire_at
+                self._versions[key] = updated_at
+                prepare_at = fire_at - timedelta(seconds=self.prewarm_seconds)
+                heapq.heappush(self._heap, (prepare_at, next(self._seq), ACTION_PREPARE, key, fire_at))
+                heapq.heappush(self._heap, (fire_at, next(self._seq), ACTION_DISPATCH, key, fire_at))
+
+    def _record_missed(self, key: Tuple[int, str], fire_at: datetime, reason: str):
+        self._missed[key] = {
+            "notice_id": key[0],
+            "kind": key[1],
+            "fire_at": fire_at,
+            "reason": reason
+        }
+        print(f"⚠️ Notice #{key[0]} ({key[1]}) jadwal {fire_at:%d/%m/%Y %H:%M} tidak dikirim: {reason}")
+
+    def _forget(self, key: Tuple[int, str]):
+        self._pending.pop(key, None)
+        self._versions.pop(key, None)
+        self._prepared.pop(key, None)
+
+    async def _process_due(self):
+        now = datetime.now()
+
+        while self._heap and self._heap[0][0] <= now:
+            _, _, action, key, fire_at = heapq.heappop(self._heap)
+
+            # Entry basi: notice dihapus, sudah dikirim, atau jadwalnya berubah
+            if key in self._dispatched or self._pending.get(key) != fire_at:
+                continue
+
+            if action == ACTION_PREPARE:
+                if key not in self._prepared:
+                    await self._prepare(key)
+            else:
+                self._dispatch(key)
+
+    def _build_payload(self, key: Tuple[int, str]) -> Optional[dict]:
+        notice_id, kind = key
+        db = ReadSessionLocal()
+        try:
+            notice = db.query(NetworkNotice).filter(NetworkNotice.id == notice_id).first()
+            if not notice or not notice.is_active:
+                return None
+
+            if kind == KIND_START:
+                message = format_notice_message(notice)
+            else:
+                message = format_restored_message(notice)
+
+            return {
+                "version": notice.updated_at,
+                "title": notice.title,
+                "message": message,
+                "recipients": query_notice_audience(db, notice)
+            }
+        finally:
+            db.close()
+
+    async def _prepare(self, key: Tuple[int, str]):
+        payload = await asyncio.to_thread(self._build_payload, key)
+        if payload is None:
+            self._forget(key)
+            return
+        self._prepared[key] = payload
+        print(f"📦 Notice #{key[0]} ({key[1]}) siap: {len(payload['recipients'])} penerima")
+
+    def _dispatch(self, key: Tuple[int, str]):
+        self._dispatched.add(key)
+        task = asyncio.create_task(self._send(key))
+        self._running_tasks.add(task)
+        task.add_done_callback(self._running_tasks.discard)
+
+    async def _send(self, key: Tuple[int, str]):
+        notice_id, kind = key
+        payload = self._prepared.get(key)
+        fire_at = self._pending.get(key)
+
+        if payload is None or payload["version"] != self._versions.get(key):
+            await self._prepare(key)
+            payload = self._prepared.get(key)
+
+        self._forget(key)
+        if not payload or not payload["recipients"]:
+            return
+
+        print(f"📢 Mengirim notice #{notice_id} ({kind}) ke {len(payload['recipients'])} pelanggan")
+        try:
+            campaign = await run_campaign(
+                payload["recipients"],
+                payload["message"],
+                campaign_id=f"notice-{notice_id}-{kind}-{fire_at:%Y%m%d%H%M%S}",
+                scheduled=True
+            )
+            results = campaign["results"]
+            sent = sum(1 for r in results if r.get("success"))
+            print(f"✅ Notice #{notice_id} ({kind}) selesai: {sent}/{len(results)} terkirim (campaign {campaign['campaign_id']})")
+        except CampaignConflict:
+            # Sudah terkirim sebelum layanan restart
+            print(f"⏭️ Notice #{notice_id} ({kind}) sudah pernah dikirim, dilewati")
+        except Exception as e:
+            print(f"❌ Gagal mengirim notice #{notice_id} ({kind}): {e}")
+
+    def get_status(self) -> dict:
+        """
+        Ringkasan status scheduler dan jadwal yang menunggu
+        """
+        upcoming = sorted(self._pending.items(), key=lambda item: item[1])
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "last_refresh": self.last_refresh,
+            "pending_count": len(upcoming),
+            "prepared_count": len(self._prepared),
+            "dispatching_count": len(self._running_tasks),
+            "missed_grace_minutes": int(self.missed_grace.total_seconds() // 60),
+            "missed": sorted(self._missed.values(), key=lambda m: m["fire_at"])[-50:],
+            "upcoming": [
+                {
+                    "notice_id": notice_id,
+                    "kind": kind,
+                    "fire_at": fire_at,
+                    "prepared": (notice_id, kind) in self._prepared,
+                    "recipients": len(self._prepared[(notice_id, kind)]["recipients"])
+                        if (notice_id, kind) in self._prepared else None
+                }
+                for (notice_id, kind), fire_at in upcoming[:50]
+            ]
+        }
+
+
+# Singleton instance
+notice_scheduler = NoticeScheduler()
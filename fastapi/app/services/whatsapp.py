@@ -1,30 +1,37 @@
 import asyncio
+import hashlib
+import math
+import mimetypes
+import os
+import random
 import re
-import base64
-from typing import Optional
+import time
+from typing import Callable, Optional
 from pathlib import Path
 import aiohttp
 
 from app.config import settings
 
+# Alasan penerima dilewati (dihitung sebagai skipped, bukan failed)
+SKIP_INVALID = "Nomor tidak valid atau 0"
+SKIP_DUPLICATE = "Nomor duplikat dalam pengiriman ini"
+SKIP_ERRORS = (SKIP_INVALID, SKIP_DUPLICATE)
 
-class WhatsAppService:
+# Error gateway jika media_hash tidak ada (mis. folder media hilang saat redeploy)
+MEDIA_MISSING = "Media tidak ditemukan"
+
+
+class HttpGatewayBackend:
     """
-    WhatsApp Service yang berkomunikasi dengan Node.js WhatsApp Gateway
-    menggunakan whatsapp-web.js (GRATIS)
-    
-    Gateway berjalan di port 3001 secara default
+    Backend produksi: Node.js WhatsApp Gateway (wa-gateway) via HTTP
     """
     
-    def __init__(self):
-        self.gateway_url = settings.WA_GATEWAY_URL
-        self.connected = False
-        self.phone_number = None
+    name = "gateway"
     
-    async def _request(self, method: str, endpoint: str, data: dict = None) -> dict:
-        """
-        Helper untuk request ke WhatsApp Gateway
-        """
+    def __init__(self, gateway_url: str):
+        self.gateway_url = gateway_url
+    
+    async def request(self, method: str, endpoint: str, data: dict = None) -> dict:
         url = f"{self.gateway_url}{endpoint}"
         
         try:
@@ -46,6 +53,356 @@ class WhatsAppService:
                 "error": str(e)
             }
     
+    async def upload_media(self, path: Path, info: dict) -> dict:
+        url = f"{self.gateway_url}/media"
+        params = {
+            "hash": info["hash"],
+            "mimetype": info["mimetype"],
+            "filename": info["filename"]
+        }
+        
+        try:
+            async with aiohttp.ClientSession() as session:
+                # File object di-stream per blok oleh aiohttp, bukan base64
+                with open(path, "rb") as f:
+                    async with session.post(
+                        url,
+                        params=params,
+                        data=f,
+                        headers={"Content-Type": "application/octet-stream"}
+                    ) as response:
+                        return await response.json()
+        except aiohttp.ClientError as e:
+            return {
+                "success": False,
+                "error": f"Gateway tidak tersedia: {str(e)}"
+            }
+
+
+class SimulatedGatewayBackend:
+    """
+    Simulator gateway in-process untuk load test dan uji kegagalan
+    (WA_USE_MOCK=true), tanpa Node.js maupun akun WhatsApp
+    
+    Meniru endpoint dan format respons wa-gateway:
+    - Latensi per pesan berdistribusi log-normal (median WA_MOCK_LATENCY_MS,
+      sebaran WA_MOCK_LATENCY_SIGMA) sehingga ada ekor lambat
+    - WA_MOCK_UNREGISTERED_RATE nomor "tidak terdaftar"; ditentukan dari
+      hash nomor sehingga konsisten antar pengiriman ulang
+    - WA_MOCK_ERROR_RATE pesan gagal kirim secara acak
+    - WA_MOCK_DISCONNECT_RATE peluang sesi terputus per pesan; tersambung
+      lagi setelah WA_MOCK_RECONNECT_SECONDS
+    - WA_MOCK_BAN_AFTER: akun diblokir setelah sekian pesan terkirim
+      (0 = tidak pernah); hanya pulih lewat /logout
+    """
+    
+    name = "simulator"
+    
+    def __init__(self):
+        self.latency_ms = settings.WA_MOCK_LATENCY_MS
+        self.latency_sigma = settings.WA_MOCK_LATENCY_SIGMA
+        self.error_rate = settings.WA_MOCK_ERROR_RATE
+        self.unregistered_rate = settings.WA_MOCK_UNREGISTERED_RATE
+        self.disconnect_rate = settings.WA_MOCK_DISCONNECT_RATE
+        self.reconnect_seconds = settings.WA_MOCK_RECONNECT_SECONDS
+        self.ban_after = settings.WA_MOCK_BAN_AFTER
+        self.honor_delay = settings.WA_MOCK_HONOR_DELAY
+        self.seed = settings.WA_MOCK_SEED
+        
+        self.phone = "6280000000000"
+        self._random = random.Random(self.seed or None)
+        self._media = set()
+        self._banned = False
+        self._reconnect_at = None  # Waktu (monotonic) sesi tersambung lagi
+        
+        self.sent = 0
+        self.failed = 0
+        self.unregistered = 0
+        self.disconnects = 0
+    
+    def _ready(self) -> bool:
+        if self._banned:
+            return False
+        if self._reconnect_at is not None:
+            if time.monotonic() < self._reconnect_at:
+                return False
+            self._reconnect_at = None
+        return True
+    
+    def _error(self) -> Optional[str]:
+        if self._banned:
+            return "Akun WhatsApp diblokir (simulasi)"
+        if self._reconnect_at is not None:
+            return "WhatsApp terputus (simulasi)"
+        return None
+    
+    def _disconnect(self):
+        self.disconnects += 1
+        self._reconnect_at = time.monotonic() + self.reconnect_seconds
+        print(f"⚠️ [Simulasi] WhatsApp terputus, tersambung lagi dalam {self.reconnect_seconds} detik")
+    
+    @staticmethod
+    def _format_phone(phone) -> str:
+        # Sama dengan format nomor di wa-gateway
+        phone = re.sub(r'\D', '', str(phone or ''))
+        if phone.startswith('0'):
+            phone = '62' + phone[1:]
+        elif phone.startswith('8'):
+            phone = '62' + phone
+        return phone
+    
+    def _is_registered(self, phone: str) -> bool:
+        digest = hashlib.sha256(f"{self.seed}:{phone}".encode()).digest()
+        return int.from_bytes(digest[:4], "big") / 0xFFFFFFFF >= self.unregistered_rate
+    
+    async def _deliver(self, phone) -> dict:
+        """
+        Simulasikan satu kiriman: cek registrasi + kirim
+        """
+        formatted = self._format_phone(phone)
+        if len(formatted) < 10 or formatted in ('0', '62'):
+            return {"phone": phone, "success": False, "error": SKIP_INVALID}
+        
+        latency = self._random.lognormvariate(math.log(max(self.latency_ms, 0.001)), self.latency_sigma)
+        await asyncio.sleep(latency / 1000)
+        
+        if not self._ready():
+            self.failed += 1
+            return {"phone": phone, "success": False, "error": self._error()}
+        
+        if not self._is_registered(formatted):
+            self.unregistered += 1
+            return {"phone": formatted, "success": False, "error": "Nomor tidak terdaftar di WhatsApp"}
+        
+        if self._random.random() < self.disconnect_rate:
+            self._disconnect()
+            self.failed += 1
+            return {"phone": phone, "success": False, "error": "Protocol error: Session closed (simulasi)"}
+        
+        if self._random.random() < self.error_rate:
+            self.failed += 1
+            return {"phone": phone, "success": False, "error": "Gagal mengirim pesan (simulasi)"}
+        
+        self.sent += 1
+        if self.ban_after and self.sent >= self.ban_after:
+            self._banned = True
+            print(f"🚫 [Simulasi] Akun diblokir setelah {self.sent} pesan")
+        
+        return {"phone": formatted, "success": True, "error": None}
+    
+    async def request(self, method: str, endpoint: str, data: dict = None) -> dict:
+        data = data or {}
+        
+        if endpoint == "/status":
+            ready = self._ready()
+            return {
+                "ready": ready,
+                "phone": self.phone if ready else None,
+                "hasQR": False,
+                "error": self._error()
+            }
+        
+        if endpoint == "/qr":
+            if self._ready():
+                return {"success": True, "message": "WhatsApp sudah terhubung", "phone": self.phone}
+            return {"success": False, "message": "QR Code belum tersedia, tunggu beberapa detik..."}
+        
+        if endpoint.startswith("/media/"):
+            return {"success": True, "exists": endpoint[len("/media/"):] in self._media}
+        
+        if endpoint == "/send":
+            if not self._ready():
+                return {"success": False, "error": "WhatsApp belum siap. Silakan scan QR code terlebih dahulu."}
+            if data.get("media_hash") and data["media_hash"] not in self._media:
+                return {"success": False, "error": "Media tidak ditemukan, upload ulang melalui /media"}
+            
+            result = await self._deliver(data.get("phone"))
+            if result["success"]:
+                return {"success": True, "phone": result["phone"], "message": "Pesan berhasil terkirim"}
+            return {"success": False, "phone": result["phone"], "error": result["error"]}
+        
+        if endpoint == "/send-bulk":
+            if not self._ready():
+                return {"success": False, "error": "WhatsApp belum siap"}
+            if data.get("media_hash") and data["media_hash"] not in self._media:
+                return {"success": False, "error": "Media tidak ditemukan, upload ulang melalui /media"}
+            
+            delay = data.get("delay", 0) / 1000
+            results = []
+            for recipient in data.get("recipients", []):
+                result = await self._deliver(recipient.get("phone"))
+                result["customer_name"] = recipient.get("name") or "Pelanggan"
+                results.append(result)
+                
+                if result["success"] and self.honor_delay and delay > 0:
+                    await asyncio.sleep(delay)
+            
+            sent = sum(1 for r in results if r["success"])
+            return {
+                "success": True,
+                "total": len(results),
+                "sent": sent,
+                "failed": len(results) - sent,
+                "results": results
+            }
+        
+        if endpoint == "/restart":
+            if self._banned:
+                return {"success": False, "error": self._error()}
+            self._reconnect_at = None
+            return {"success": True, "message": "WhatsApp sedang direstart"}
+        
+        if endpoint == "/logout":
+            # Seperti login ulang dengan nomor baru setelah scan QR
+            self._banned = False
+            self.sent = 0
+            self._reconnect_at = time.monotonic() + self.reconnect_seconds
+            return {"success": True, "message": "Berhasil logout"}
+        
+        return {"success": False, "error": f"Endpoint tidak dikenal: {method} {endpoint}"}
+    
+    async def upload_media(self, path: Path, info: dict) -> dict:
+        self._media.add(info["hash"])
+        return {"success": True, "hash": info["hash"]}
+    
+    def get_stats(self) -> dict:
+        """
+        Statistik simulator
+        """
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "unregistered": self.unregistered,
+            "disconnects": self.disconnects,
+            "banned": self._banned,
+            "ready": self._ready()
+        }
+
+
+class WhatsAppService:
+    """
+    WhatsApp Service yang berkomunikasi dengan Node.js WhatsApp Gateway
+    menggunakan whatsapp-web.js (GRATIS)
+    
+    Gateway berjalan di port 3001 secara default. Dengan WA_USE_MOCK=true
+    dipakai simulator in-process (SimulatedGatewayBackend).
+    """
+    
+    def __init__(self):
+        self.gateway_url = settings.WA_GATEWAY_URL
+        if settings.WA_USE_MOCK:
+            self.backend = SimulatedGatewayBackend()
+        else:
+            self.backend = HttpGatewayBackend(self.gateway_url)
+        self.connected = False
+        self.phone_number = None
+        self.media_root = Path(settings.MEDIA_ROOT).resolve()
+        
+        # (path, mtime, size) -> info media, agar file tidak di-hash ulang
+        self._media_info = {}
+        # Hash media yang sudah ada di gateway
+        self._uploaded_media = set()
+        self._media_locks = {}
+        
+        self.bulk_chunk_size = max(settings.WA_BULK_CHUNK_SIZE, 1)
+        
+        # Rata-rata detik per penerima dari pengiriman sebelumnya (EWMA)
+        self.seconds_per_recipient = None
+    
+    async def _request(self, method: str, endpoint: str, data: dict = None) -> dict:
+        """
+        Helper untuk request ke WhatsApp Gateway (atau simulator)
+        """
+        return await self.backend.request(method, endpoint, data)
+    
+    def resolve_media_path(self, media: str) -> Path:
+        """
+        Ubah path media relatif (mis. brosur/Brosur-1.png) menjadi path absolut
+        di dalam MEDIA_ROOT. ValueError jika file tidak valid.
+        """
+        path = (self.media_root / media).resolve()
+        
+        if self.media_root not in path.parents:
+            raise ValueError("Path media harus berada di dalam folder media")
+        if not path.is_file():
+            raise ValueError(f"File media tidak ditemukan: {media}")
+        if path.stat().st_size > settings.MEDIA_MAX_BYTES:
+            raise ValueError(f"File media melebihi {settings.MEDIA_MAX_BYTES // (1024 * 1024)} MB")
+        
+        return path
+    
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        # Dibaca per blok agar file besar tidak dimuat utuh ke memori
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    async def prepare_media(self, path: Path) -> dict:
+        """
+        Pastikan media sudah ada di gateway dan kembalikan hash-nya
+        
+        File di-hash sekali per (path, mtime, size) dan diupload sekali per
+        hash; kiriman selanjutnya cukup mereferensikan media_hash.
+        """
+        stat = os.stat(path)
+        key = (str(path), stat.st_mtime_ns, stat.st_size)
+        
+        info = self._media_info.get(key)
+        if info is None:
+            info = {
+                "hash": await asyncio.to_thread(self._hash_file, path),
+                "mimetype": mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+                "filename": path.name
+            }
+            self._media_info[key] = info
+        
+        media_hash = info["hash"]
+        if media_hash in self._uploaded_media:
+            return info
+        
+        lock = self._media_locks.setdefault(media_hash, asyncio.Lock())
+        async with lock:
+            if media_hash in self._uploaded_media:
+                return info
+            
+            result = await self._request("GET", f"/media/{media_hash}")
+            if not result.get("exists"):
+                result = await self._upload_media(path, info)
+                if not result.get("success"):
+                    raise RuntimeError(result.get("error", "Upload media gagal"))
+            
+            self._uploaded_media.add(media_hash)
+        
+        return info
+    
+    async def _upload_media(self, path: Path, info: dict) -> dict:
+        return await self.backend.upload_media(path, info)
+    
+    async def _send_with_media(self, endpoint: str, payload: dict, media_path: Path = None) -> dict:
+        """
+        POST ke gateway; jika media_hash sudah tidak ada di gateway,
+        upload ulang media lalu coba sekali lagi
+        """
+        result = await self._request("POST", endpoint, payload)
+        
+        media_hash = payload.get("media_hash")
+        if media_hash and media_path and MEDIA_MISSING in (result.get("error") or ""):
+            print(f"⚠️ Media {media_hash[:12]} hilang dari gateway, upload ulang")
+            self._uploaded_media.discard(media_hash)
+            try:
+                await self.prepare_media(media_path)
+            except Exception as e:
+                return {
+                    "success": False,
+                    "error": f"Media gagal disiapkan: {str(e)}"
+                }
+            result = await self._request("POST", endpoint, payload)
+        
+        return result
+    
     def normalize_phone(self, phone: str) -> str:
         """
         Normalize phone number ke format internasional Indonesia
@@ -113,13 +470,18 @@ class WhatsAppService:
         self.connected = result.get("ready", False)
         self.phone_number = result.get("phone")
         
-        return {
+        status = {
             "connected": self.connected,
             "phone_number": self.phone_number,
             "has_qr": result.get("hasQR", False),
             "error": result.get("error"),
-            "gateway_url": self.gateway_url
+            "gateway_url": self.gateway_url,
+            "backend": self.backend.name
         }
+        if isinstance(self.backend, SimulatedGatewayBackend):
+            status["simulator"] = self.backend.get_stats()
+        
+        return status
     
     async def get_qr(self) -> dict:
         """
@@ -127,9 +489,12 @@ class WhatsAppService:
         """
         return await self._request("GET", "/qr")
     
-    async def send_message(self, phone: str, message: str) -> dict:
+    async def send_message(self, phone: str, message: str, media_path: Path = None) -> dict:
         """
         Kirim pesan WhatsApp ke nomor tertentu
+        
+        Jika media_path diisi, file dikirim sebagai gambar/dokumen dengan
+        message sebagai caption
         """
         if not self.is_valid_phone(phone):
             return {
@@ -138,54 +503,178 @@ class WhatsAppService:
                 "error": "Nomor telepon tidak valid atau 0"
             }
         
-        result = await self._request("POST", "/send", {
+        payload = {
             "phone": phone,
             "message": message
-        })
+        }
+        
+        if media_path:
+            try:
+                payload["media_hash"] = (await self.prepare_media(media_path))["hash"]
+            except Exception as e:
+                return {
+                    "success": False,
+                    "phone": phone,
+                    "error": f"Media gagal disiapkan: {str(e)}"
+                }
+        
+        result = await self._send_with_media("/send", payload, media_path)
         
         return result
     
-    async def send_bulk(self, recipients: list, message: str, delay: float = 2.0) -> list:
+    def plan_recipients(self, recipients: list) -> dict:
         """
-        Kirim pesan ke banyak nomor via gateway
+        Pisahkan penerima menjadi valid, invalid dan duplikat
+        
+        Dipakai oleh send_bulk dan dry run sehingga keduanya menghasilkan
+        audience yang sama. Duplikat ditentukan dari nomor yang sudah
+        dinormalisasi; penerima pertama yang dipertahankan.
         """
-        # Filter nomor yang tidak valid terlebih dahulu
-        valid_recipients = []
-        results = []
+        valid = []
+        skipped = []
+        seen = set()
+        normalized_count = 0
         
         for recipient in recipients:
             phone = recipient.get('phone', '')
             name = recipient.get('name', 'Pelanggan')
             
             if not self.is_valid_phone(phone):
-                results.append({
+                skipped.append({
                     "phone": phone,
                     "customer_name": name,
                     "success": False,
-                    "error": "Nomor tidak valid atau 0"
+                    "error": SKIP_INVALID
                 })
-            else:
-                valid_recipients.append(recipient)
+                continue
+            
+            normalized = self.normalize_phone(phone)
+            if normalized != phone:
+                normalized_count += 1
+            
+            if normalized in seen:
+                skipped.append({
+                    "phone": normalized,
+                    "customer_name": name,
+                    "success": False,
+                    "error": SKIP_DUPLICATE
+                })
+                continue
+            
+            seen.add(normalized)
+            valid.append(recipient)
+        
+        return {
+            "valid": valid,
+            "skipped": skipped,
+            "invalid_count": sum(1 for r in skipped if r["error"] == SKIP_INVALID),
+            "duplicate_count": sum(1 for r in skipped if r["error"] == SKIP_DUPLICATE),
+            "normalized_count": normalized_count
+        }
+    
+    def estimate_seconds(self, recipient_count: int, delay: float = 2.0) -> dict:
+        """
+        Perkiraan durasi kirim berdasarkan kecepatan kirim yang teramati
+        """
+        if self.seconds_per_recipient is not None:
+            per_recipient = self.seconds_per_recipient
+            source = "observed"
+        else:
+            per_recipient = delay + 0.5  # Delay antar pesan + perkiraan waktu kirim
+            source = "default"
+        
+        return {
+            "estimated_seconds": round(recipient_count * per_recipient, 1),
+            "seconds_per_recipient": round(per_recipient, 3),
+            "rate_source": source
+        }
+    
+    def _observe_rate(self, recipient_count: int, elapsed: float):
+        if recipient_count <= 0:
+            return
+        per_recipient = elapsed / recipient_count
+        if self.seconds_per_recipient is None:
+            self.seconds_per_recipient = per_recipient
+        else:
+            self.seconds_per_recipient = 0.8 * self.seconds_per_recipient + 0.2 * per_recipient
+    
+    async def send_bulk(
+        self,
+        recipients: list,
+        message: str,
+        delay: float = 2.0,
+        campaign_id: str = None,
+        media_path: Path = None,
+        on_progress: Callable[[list], None] = None
+    ) -> list:
+        """
+        Kirim pesan ke banyak nomor via gateway
+        
+        - Penerima dikirim per chunk (WA_BULK_CHUNK_SIZE) sehingga hasil per
+          penerima bisa dilaporkan lewat on_progress selama pengiriman
+        - campaign_id diteruskan ke gateway agar ack (delivered/read) bisa
+          dikirim balik ke /api/receipts
+        - media_path diupload sekali ke gateway, lalu setiap penerima hanya
+          mereferensikan media_hash-nya
+        """
+        # Filter nomor yang tidak valid atau duplikat terlebih dahulu
+        plan = self.plan_recipients(recipients)
+        valid_recipients = plan["valid"]
+        results = list(plan["skipped"])
+        
+        if on_progress and results:
+            on_progress(results)
+        
+        if not valid_recipients:
+            return results
+        
+        payload = {
+            "message": message,
+            "delay": int(delay * 1000)  # Convert to milliseconds
+        }
+        if campaign_id:
+            payload["campaign_id"] = campaign_id
+        
+        media_error = None
+        if media_path:
+            try:
+                payload["media_hash"] = (await self.prepare_media(media_path))["hash"]
+            except Exception as e:
+                media_error = f"Media gagal disiapkan: {str(e)}"
         
         # Kirim ke gateway untuk nomor yang valid
-        if valid_recipients:
-            gateway_result = await self._request("POST", "/send-bulk", {
-                "recipients": valid_recipients,
-                "message": message,
-                "delay": int(delay * 1000)  # Convert to milliseconds
-            })
+        for i in range(0, len(valid_recipients), self.bulk_chunk_size):
+            chunk = valid_recipients[i:i + self.bulk_chunk_size]
+            
+            if media_error:
+                gateway_result = {"error": media_error}
+            else:
+                started = time.monotonic()
+                gateway_result = await self._send_with_media(
+                    "/send-bulk",
+                    {**payload, "recipients": chunk},
+                    media_path
+                )
             
             if gateway_result.get("results"):
-                results.extend(gateway_result["results"])
-            elif gateway_result.get("error"):
+                self._observe_rate(len(chunk), time.monotonic() - started)
+                chunk_results = gateway_result["results"]
+            else:
                 # Jika gateway error, tandai semua sebagai gagal
-                for recipient in valid_recipients:
-                    results.append({
+                error = gateway_result.get("error") or "Gateway tidak mengembalikan hasil"
+                chunk_results = [
+                    {
                         "phone": recipient.get('phone', ''),
                         "customer_name": recipient.get('name', 'Pelanggan'),
                         "success": False,
-                        "error": gateway_result.get("error")
-                    })
+                        "error": error
+                    }
+                    for recipient in chunk
+                ]
+            
+            results.extend(chunk_results)
+            if on_progress:
+                on_progress(chunk_results)
         
         return results
     
@@ -1,16 +1,29 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 
 from app.config import settings
+from app.database import get_pool_stats
 from app.routers.notifications import router as notifications_router
+from app.routers.scheduler import router as scheduler_router
+from app.routers.receipts import router as receipts_router
+from app.routers.cache import router as cache_router
+from app.routers.outages import router as outages_router
+from app.routers.progress import router as progress_router
 from app.services.whatsapp import whatsapp_service
+from app.services.scheduler import notice_scheduler
+from app.services.receipts import receipt_service
+from app.services.cache import query_cache
+from app.services.outages import outage_detector
+from app.services.admission import AdmissionRejected
+from app.services.campaigns import CampaignConflict
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Lifecycle management untuk FastAPI
-    - Startup: Inisialisasi WhatsApp connection
+    - Startup: Inisialisasi WhatsApp connection & scheduler notice
     - Shutdown: Cleanup resources
     """
     # Startup
@@ -18,6 +31,9 @@ async def lifespan(app: FastAPI):
     result = await whatsapp_service.connect()
     status = await whatsapp_service.get_status()
     
+    if settings.WA_USE_MOCK:
+        print("🧪 WA_USE_MOCK aktif: pesan dikirim ke simulator gateway, bukan WhatsApp")
+    
     if status.get("connected"):
         print(f"✅ WhatsApp terhubung sebagai {status.get('phone_number')}")
     elif status.get("has_qr"):
@@ -25,10 +41,22 @@ async def lifespan(app: FastAPI):
     else:
         print("⚠️ WhatsApp Gateway belum tersedia. Jalankan: cd wa-gateway && node server.js")
     
+    receipt_service.start()
+    query_cache.start()
+    outage_detector.start()
+    
+    if settings.NOTICE_SCHEDULER_ENABLED:
+        notice_scheduler.start()
+        print("⏰ Scheduler notice aktif")
+    
     yield
     
     # Shutdown
     print("🛑 Shutting down WhatsApp Notification Service...")
+    await notice_scheduler.stop()
+    await receipt_service.stop()
+    await query_cache.stop()
+    await outage_detector.stop()
 
 
 app = FastAPI(
@@ -42,14 +70,21 @@ app = FastAPI(
     - 👤 Kirim notifikasi ke pelanggan tertentu
     - 🏢 Kirim notifikasi berdasarkan ODP
     - ✉️ Kirim pesan kustom
+    - 📎 Lampirkan brosur / peta gangguan (diupload sekali per campaign)
     - ⏭️ Otomatis skip pelanggan dengan nomor tidak valid (0)
+    - ⏰ Kirim otomatis saat start_time notice dan pesan "layanan pulih" saat end_time
+    - 📬 Lacak delivered/read rate per campaign dari ack gateway
+    - ⚡ Cache query notice & pelanggan, invalidasi otomatis saat data berubah
+    - 🚦 Batasi pengiriman massal bersamaan (antrean + 429 dengan Retry-After)
+    - 🛰️ Deteksi gangguan per ODP dari aduan pelanggan
+    - 📊 Pantau progres campaign secara live via WebSocket
     
     ## Konfigurasi WhatsApp
     
     Set environment variables berikut di file `.env`:
     - `WA_API_URL`: URL API WhatsApp gateway (Fonnte, Wablas, dll)
     - `WA_API_TOKEN`: Token autentikasi API
-    - `WA_USE_MOCK`: Set ke `false` untuk mode produksi
+    - `WA_USE_MOCK`: Set ke `true` untuk memakai simulator gateway bawaan (load test tanpa wa-gateway), `false` untuk mode produksi
     """,
     version="1.0.0",
     lifespan=lifespan
@@ -64,8 +99,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """
+    Pengiriman massal ditolak karena kapasitas penuh
+    """
+    return JSONResponse(
+        status_code=429,
+        content={"detail": exc.message, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(CampaignConflict)
+async def campaign_conflict_handler(request: Request, exc: CampaignConflict):
+    """
+    campaign_id dari client sudah dipakai campaign lain
+    """
+    return JSONResponse(status_code=409, content={"detail": exc.message})
+
 # Include routers
 app.include_router(notifications_router)
+app.include_router(scheduler_router)
+app.include_router(receipts_router)
+app.include_router(cache_router)
+app.include_router(outages_router)
+app.include_router(progress_router)
 
 # Debug: Print all routes on startup
 @app.on_event("startup")
@@ -100,6 +158,14 @@ async def health_check():
     }
 
 
+@app.get("/health/db")
+async def database_pool_status():
+    """
+    Statistik connection pool database (primary & read replica)
+    """
+    return get_pool_stats()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.database import Base  # noqa: E402
+from app.services.cache import query_cache  # noqa: E402
+
+
+@pytest.fixture
+def session_factory():
+    """
+    Database SQLite in-memory dengan skema dari app.models
+    """
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    query_cache.clear()
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    query_cache.clear()
+    engine.dispose()
@@ -0,0 +1,219 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+def _controller(
+    max_campaigns=1,
+    max_recipients=100,
+    max_waiting=10,
+    max_queued_recipients=1000,
+    queue_timeout=5.0
+) -> AdmissionController:
+    controller = AdmissionController()
+    controller.max_campaigns = max_campaigns
+    controller.max_recipients = max_recipients
+    controller.max_waiting = max_waiting
+    controller.max_queued_recipients = max_queued_recipients
+    controller.queue_timeout = queue_timeout
+    return controller
+
+
+async def _hold(controller, recipients, order, name, release: asyncio.Event, **kwargs):
+    async with controller.admit(recipients, **kwargs):
+        order.append(name)
+        await release.wait()
+
+
+def test_waiters_are_admitted_in_fifo_order():
+    async def run():
+        controller = _controller()
+        order = []
+        releases = {name: asyncio.Event() for name in "abc"}
+        tasks = [
+            asyncio.create_task(_hold(controller, 10, order, name, releases[name]))
+            for name in "abc"
+        ]
+        await asyncio.sleep(0)
+        assert order == ["a"]
+        assert controller.get_stats()["waiting_campaigns"] == 2
+
+        for name in "abc":
+            releases[name].set()
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+        return controller, order
+
+    controller, order = asyncio.run(run())
+    assert order == ["a", "b", "c"]
+    assert controller.active_campaigns == 0
+    assert controller.active_recipients == 0
+
+
+def test_oversized_campaign_runs_alone():
+    async def run():
+        controller = _controller(max_campaigns=2, max_recipients=100)
+        async with controller.admit(500):
+            assert controller.active_recipients == 500
+            with pytest.raises(AdmissionRejected):
+                async with controller.admit(10, timeout=0.01):
+                    pass
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.timed_out_total == 1
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def run():
+        controller = _controller(max_waiting=1)
+        release = asyncio.Event()
+        order = []
+        running = asyncio.create_task(_hold(controller, 1, order, "a", release))
+        waiting = asyncio.create_task(_hold(controller, 1, order, "b", release))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit(1):
+                pass
+
+        release.set()
+        await asyncio.gather(running, waiting)
+        return controller, rejected.value
+
+    controller, rejected = asyncio.run(run())
+    assert rejected.retry_after >= 1
+    assert controller.rejected_total == 1
+
+
+def test_queued_recipients_are_capped():
+    async def run():
+        controller = _controller(max_queued_recipients=100)
+        release = asyncio.Event()
+        order = []
+        running = asyncio.create_task(_hold(controller, 10, order, "running", release))
+        queued = asyncio.create_task(_hold(controller, 60, order, "queued", release))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected):
+            async with controller.admit(50):
+                pass
+        fits = asyncio.create_task(_hold(controller, 40, order, "fits", release))
+        await asyncio.sleep(0)
+        assert controller.get_stats()["waiting_recipients"] == 100
+
+        release.set()
+        await asyncio.gather(running, queued, fits)
+        return controller, order
+
+    controller, order = asyncio.run(run())
+    assert order == ["running", "queued", "fits"]
+    assert controller.rejected_total == 1
+
+
+def test_oversized_campaign_may_wait_in_empty_queue():
+    async def run():
+        controller = _controller(max_queued_recipients=100)
+        release = asyncio.Event()
+        order = []
+        running = asyncio.create_task(_hold(controller, 10, order, "running", release))
+        large = asyncio.create_task(_hold(controller, 150, order, "large", release))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(running, large)
+        return order
+
+    assert asyncio.run(run()) == ["running", "large"]
+
+
+def test_unbounded_admission_ignores_queue_limit():
+    async def run():
+        controller = _controller(max_waiting=0)
+        release = asyncio.Event()
+        order = []
+        running = asyncio.create_task(_hold(controller, 1, order, "a", release))
+        scheduled = asyncio.create_task(
+            _hold(controller, 1, order, "scheduled", release, timeout=None, bounded=False)
+        )
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(running, scheduled)
+        return order
+
+    assert asyncio.run(run()) == ["a", "scheduled"]
+
+
+def test_timed_out_waiter_leaves_queue_and_unblocks_next():
+    async def run():
+        controller = _controller(max_campaigns=1)
+        release = asyncio.Event()
+        order = []
+        running = asyncio.create_task(_hold(controller, 1, order, "a", release))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected):
+            async with controller.admit(1, timeout=0.01):
+                pass
+        assert controller.get_stats()["waiting_campaigns"] == 0
+
+        release.set()
+        await running
+        async with controller.admit(1, timeout=0.01):
+            order.append("b")
+        return controller, order
+
+    controller, order = asyncio.run(run())
+    assert order == ["a", "b"]
+    assert controller.timed_out_total == 1
+
+
+def test_cancelled_waiter_is_removed_from_queue():
+    async def run():
+        controller = _controller(max_campaigns=1)
+        release = asyncio.Event()
+        order = []
+        running = asyncio.create_task(_hold(controller, 1, order, "a", release))
+        cancelled = asyncio.create_task(_hold(controller, 1, order, "cancelled", release))
+        behind = asyncio.create_task(_hold(controller, 1, order, "c", release))
+        await asyncio.sleep(0)
+
+        cancelled.cancel()
+        await asyncio.sleep(0.01)
+        assert controller.get_stats()["waiting_campaigns"] == 1
+
+        release.set()
+        await asyncio.gather(running, behind)
+        return controller, order
+
+    controller, order = asyncio.run(run())
+    assert order == ["a", "c"]
+    assert controller.active_campaigns == 0
+
+
+def test_cancel_after_slot_granted_releases_it():
+    async def run():
+        controller = _controller(max_campaigns=1)
+        release = asyncio.Event()
+        order = []
+        running = asyncio.create_task(_hold(controller, 1, order, "a", release))
+        waiter = asyncio.create_task(_hold(controller, 1, order, "b", asyncio.Event()))
+        await asyncio.sleep(0)
+
+        # Slot diberikan ke waiter (future selesai) tetapi task-nya dibatalkan
+        # sebelum sempat berjalan
+        release.set()
+        await running
+        avg_duration = controller._avg_duration
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # Slot yang batal dipakai tidak ikut menurunkan rata-rata durasi
+        assert controller._avg_duration == avg_duration
+        return controller, order
+
+    controller, order = asyncio.run(run())
+    assert order == ["a"]
+    assert controller.active_campaigns == 0
+    assert controller.active_recipients == 0
@@ -0,0 +1,150 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Complaint, Customer
+from app.routers import outages as outages_router
+from app.schemas import OutageNoticeRequest
+from app.services import outages as outages_module
+from app.services import scheduler as scheduler_module
+from app.services.outages import OutageDetector
+from app.services.scheduler import KIND_START, NoticeScheduler
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    session.add_all([
+        Customer(id=1, name="A1", phone="081200000001", odp="ODP-A"),
+        Customer(id=2, name="A2", phone="081200000002", odp="ODP-A"),
+        Customer(id=3, name="A3", phone="081200000003", odp="ODP-A"),
+        Customer(id=4, name="B1", phone="081200000004", odp="ODP-B")
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def detector(monkeypatch, session_factory):
+    monkeypatch.setattr(outages_module, "ReadSessionLocal", session_factory)
+    detector = OutageDetector()
+    detector.window = timedelta(minutes=60)
+    detector.threshold = 3
+    detector.batch_size = 2  # Kecil agar pembacaan bertahap ikut teruji
+    return detector
+
+
+def _complaint(db, complaint_id, customer_id, minutes_ago, category="gangguan"):
+    db.add(Complaint(
+        id=complaint_id,
+        customer_id=customer_id,
+        subject="Internet mati",
+        message="Tidak bisa konek",
+        category=category,
+        created_at=datetime.now() - timedelta(minutes=minutes_ago)
+    ))
+    db.commit()
+
+
+def test_backfill_only_counts_complaints_inside_window(db, detector):
+    _complaint(db, 1, 1, minutes_ago=180)
+    _complaint(db, 2, 2, minutes_ago=120)
+    _complaint(db, 3, 1, minutes_ago=30)
+    _complaint(db, 4, 2, minutes_ago=20)
+    _complaint(db, 5, 3, minutes_ago=10)
+    _complaint(db, 6, 4, minutes_ago=5)
+    _complaint(db, 7, 4, minutes_ago=4, category="pembayaran")
+
+    asyncio.run(detector.poll())
+
+    assert detector.high_water_mark == 7
+    outages = detector.get_outages()
+    assert [(o["odp"], o["customer_count"], o["complaint_count"]) for o in outages] == [("ODP-A", 3, 3)]
+
+
+def test_same_customer_is_counted_once(db, detector):
+    _complaint(db, 1, 1, minutes_ago=30)
+    _complaint(db, 2, 1, minutes_ago=20)
+    _complaint(db, 3, 2, minutes_ago=10)
+
+    asyncio.run(detector.poll())
+
+    assert detector.get_outages() == []
+    assert detector.get_outages(threshold=2)[0]["complaint_count"] == 3
+
+
+def test_incremental_poll_dedupes_overlap_and_catches_late_commits(db, detector):
+    _complaint(db, 10, 1, minutes_ago=30)
+    _complaint(db, 30, 2, minutes_ago=20)
+
+    async def run():
+        await detector.poll()
+        processed = detector.complaints_processed
+
+        # Dibaca ulang lewat overlap, tidak boleh terhitung dua kali
+        await detector.poll()
+        assert detector.complaints_processed == processed
+
+        # Insert dengan id di bawah high-water mark yang commit-nya terlambat
+        _complaint(db, 25, 3, minutes_ago=1)
+        await detector.poll()
+
+    asyncio.run(run())
+
+    assert detector.high_water_mark == 30
+    outage = detector.get_outages()[0]
+    assert (outage["odp"], outage["customer_count"], outage["complaint_count"]) == ("ODP-A", 3, 3)
+
+
+def test_prune_drops_expired_complaints(db, detector):
+    _complaint(db, 1, 1, minutes_ago=50)
+    _complaint(db, 2, 2, minutes_ago=20)
+    _complaint(db, 3, 3, minutes_ago=10)
+
+    asyncio.run(detector.poll())
+    assert detector.get_outages()[0]["customer_count"] == 3
+
+    # 15 menit kemudian aduan pertama keluar dari window
+    detector._prune(datetime.now() + timedelta(minutes=15))
+    assert detector.get_outages() == []
+    assert detector.get_outages(threshold=2)[0]["customer_count"] == 2
+
+    detector._prune(datetime.now() + timedelta(hours=2))
+    assert detector.get_stats()["tracked_odps"] == 0
+
+
+def test_activated_notice_is_sent_even_if_complaints_are_old(db, detector, session_factory, monkeypatch):
+    _complaint(db, 1, 1, minutes_ago=55)
+    _complaint(db, 2, 2, minutes_ago=50)
+    _complaint(db, 3, 3, minutes_ago=45)
+    asyncio.run(detector.poll())
+
+    sent = []
+
+    async def fake_run_campaign(recipients, message, campaign_id=None, scheduled=False, media_path=None):
+        sent.append(campaign_id)
+        return {"campaign_id": campaign_id, "results": []}
+
+    monkeypatch.setattr(outages_router, "outage_detector", detector)
+    monkeypatch.setattr(scheduler_module, "ReadSessionLocal", session_factory)
+    monkeypatch.setattr(scheduler_module, "run_campaign", fake_run_campaign)
+
+    notice = asyncio.run(outages_router.draft_outage_notice(OutageNoticeRequest(activate=True), db))
+    assert notice.affected_odp == "ODP-A"
+
+    # Layanan restart setelah notice diaktifkan; aduan pertama lebih tua dari grace
+    scheduler = NoticeScheduler()
+    scheduler._started_at = datetime.now() + timedelta(seconds=1)
+    scheduler.missed_grace = timedelta(minutes=30)
+
+    async def run():
+        await scheduler.refresh()
+        await scheduler._process_due()
+        await asyncio.gather(*scheduler._running_tasks)
+
+    asyncio.run(run())
+
+    assert [c.rsplit("-", 1)[0] for c in sent] == [f"notice-{notice.id}-{KIND_START}"]
+    assert scheduler.get_status()["missed"] == []
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.services.receipts import ReceiptService
+
+PHONE = "081234567890"
+KEY = ("campaign-1", "6281234567890")
+
+
+def test_aware_ack_is_merged_with_naive_sent_at():
+    service = ReceiptService()
+    sent_at = datetime.now().replace(microsecond=0)
+    # Gateway mengirim ack dalam UTC (new Date().toISOString())
+    delivered_utc = (sent_at + timedelta(seconds=5)).astimezone(timezone.utc)
+
+    service.add("campaign-1", PHONE, "sent", sent_at)
+    service.add("campaign-1", PHONE, "delivered", delivered_utc)
+    service.add("campaign-1", PHONE, "sent")  # Tanpa timestamp -> waktu lokal sekarang
+
+    row = service._buffer[KEY]
+    assert row["sent_at"] == sent_at
+    assert row["delivered_at"] == sent_at + timedelta(seconds=5)
+    assert all(value.tzinfo is None for value in row.values())
+
+
+def test_read_implies_delivered():
+    service = ReceiptService()
+    read_at = datetime(2026, 10, 19, 10, 0, 0)
+
+    service.add("campaign-1", PHONE, "read", read_at)
+
+    assert service._buffer[KEY] == {"read_at": read_at, "delivered_at": read_at}
+
+
+def test_earliest_timestamp_wins():
+    service = ReceiptService()
+    first = datetime(2026, 10, 19, 10, 0, 0)
+    later = first + timedelta(minutes=5)
+
+    service.add("campaign-1", PHONE, "delivered", later)
+    service.add("campaign-1", PHONE, "delivered", first)
+    service.add("campaign-1", PHONE, "read", later)
+
+    row = service._buffer[KEY]
+    assert row["delivered_at"] == first
+    assert row["read_at"] == later
+
+
+def test_failed_write_puts_rows_back_into_buffer(monkeypatch):
+    service = ReceiptService()
+    delivered_at = datetime(2026, 10, 19, 10, 5, 0)
+    service.add("campaign-1", PHONE, "delivered", delivered_at)
+
+    def failing_write(rows):
+        # Event baru bisa masuk selama flush berjalan
+        service.add("campaign-1", PHONE, "delivered", delivered_at - timedelta(minutes=1))
+        service.add("campaign-1", PHONE, "read", delivered_at + timedelta(minutes=1))
+        raise RuntimeError("database tidak tersedia")
+
+    monkeypatch.setattr(service, "_write", failing_write)
+    asyncio.run(service.flush())
+
+    assert service.flush_errors == 1
+    assert service.rows_written == 0
+    assert service._buffer[KEY] == {
+        "delivered_at": delivered_at - timedelta(minutes=1),
+        "read_at": delivered_at + timedelta(minutes=1)
+    }
+
+    written = []
+    monkeypatch.setattr(service, "_write", written.extend)
+    asyncio.run(service.flush())
+
+    assert service._buffer == {}
+    assert [(r["campaign_id"], r["phone"], r["delivered_at"]) for r in written] == [
+        ("campaign-1", "6281234567890", delivered_at - timedelta(minutes=1))
+    ]
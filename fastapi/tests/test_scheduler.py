@@ -0,0 +1,172 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Customer, NetworkNotice
+from app.services import scheduler as scheduler_module
+from app.services.campaigns import CampaignConflict
+from app.services.scheduler import KIND_END, KIND_START, NoticeScheduler
+
+
+@pytest.fixture
+def sent(monkeypatch, session_factory):
+    """
+    Ganti run_campaign dengan pencatat; scheduler membaca dari SQLite
+    """
+    calls = []
+
+    async def fake_run_campaign(recipients, message, campaign_id=None, scheduled=False, media_path=None):
+        calls.append({"recipients": recipients, "campaign_id": campaign_id, "scheduled": scheduled})
+        return {"campaign_id": campaign_id, "results": [{"success": True} for _ in recipients]}
+
+    monkeypatch.setattr(scheduler_module, "ReadSessionLocal", session_factory)
+    monkeypatch.setattr(scheduler_module, "run_campaign", fake_run_campaign)
+    return calls
+
+
+def _add_notice(session_factory, **fields) -> int:
+    db = session_factory()
+    try:
+        if not db.query(Customer).count():
+            db.add(Customer(name="Budi", phone="081234567890", is_active=True))
+        notice = NetworkNotice(
+            title="Gangguan",
+            message="Ada gangguan",
+            is_active=True,
+            updated_at=datetime.now(),
+            **fields
+        )
+        db.add(notice)
+        db.commit()
+        return notice.id
+    finally:
+        db.close()
+
+
+def _update_notice(session_factory, notice_id: int, **fields):
+    db = session_factory()
+    try:
+        db.query(NetworkNotice).filter(NetworkNotice.id == notice_id).update(fields)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _tick(scheduler: NoticeScheduler):
+    await scheduler.refresh()
+    await scheduler._process_due()
+    await asyncio.gather(*scheduler._running_tasks)
+
+
+def _new_scheduler(started_at: datetime) -> NoticeScheduler:
+    scheduler = NoticeScheduler()
+    scheduler._started_at = started_at
+    return scheduler
+
+
+def test_due_notice_is_dispatched_once(session_factory, sent):
+    now = datetime.now()
+    notice_id = _add_notice(session_factory, start_time=now - timedelta(seconds=1))
+    scheduler = _new_scheduler(now - timedelta(minutes=1))
+
+    async def run():
+        await _tick(scheduler)
+        await _tick(scheduler)
+
+    asyncio.run(run())
+
+    assert len(sent) == 1
+    assert sent[0]["scheduled"] is True
+    assert sent[0]["campaign_id"].startswith(f"notice-{notice_id}-{KIND_START}-")
+    assert scheduler.get_status()["pending_count"] == 0
+
+
+def test_rescheduled_notice_skips_stale_heap_entries(session_factory, sent):
+    now = datetime.now()
+    notice_id = _add_notice(session_factory, start_time=now - timedelta(seconds=1))
+    scheduler = _new_scheduler(now - timedelta(minutes=1))
+
+    async def run():
+        await scheduler.refresh()
+        _update_notice(
+            session_factory,
+            notice_id,
+            start_time=now + timedelta(hours=1),
+            updated_at=now + timedelta(seconds=1)
+        )
+        await _tick(scheduler)
+
+    asyncio.run(run())
+
+    # Entry lama (sudah jatuh tempo) diabaikan; jadwal baru masih menunggu
+    assert sent == []
+    assert scheduler._pending[(notice_id, KIND_START)] == now + timedelta(hours=1)
+    assert all(entry[0] > now for entry in scheduler._heap)
+
+
+def test_missed_events_within_grace_are_sent(session_factory, sent):
+    now = datetime.now()
+    scheduler = _new_scheduler(now)
+    scheduler.missed_grace = timedelta(minutes=30)
+
+    ongoing = _add_notice(
+        session_factory,
+        start_time=now - timedelta(minutes=10),
+        end_time=now + timedelta(hours=1)
+    )
+    too_old = _add_notice(
+        session_factory,
+        start_time=now - timedelta(hours=2),
+        end_time=now + timedelta(hours=1)
+    )
+    resolved = _add_notice(
+        session_factory,
+        start_time=now - timedelta(minutes=20),
+        end_time=now - timedelta(minutes=5)
+    )
+
+    asyncio.run(_tick(scheduler))
+
+    sent_ids = sorted(call["campaign_id"].rsplit("-", 1)[0] for call in sent)
+    assert sent_ids == [f"notice-{ongoing}-{KIND_START}", f"notice-{resolved}-{KIND_END}"]
+
+    missed = {(m["notice_id"], m["kind"]) for m in scheduler.get_status()["missed"]}
+    assert missed == {(too_old, KIND_START), (resolved, KIND_START)}
+
+
+def test_already_sent_campaign_is_skipped(session_factory, monkeypatch):
+    now = datetime.now()
+    _add_notice(session_factory, start_time=now - timedelta(seconds=1))
+
+    async def conflict(recipients, message, campaign_id=None, scheduled=False, media_path=None):
+        raise CampaignConflict(campaign_id)
+
+    monkeypatch.setattr(scheduler_module, "ReadSessionLocal", session_factory)
+    monkeypatch.setattr(scheduler_module, "run_campaign", conflict)
+    scheduler = _new_scheduler(now - timedelta(minutes=1))
+
+    asyncio.run(_tick(scheduler))
+
+    assert scheduler.get_status()["pending_count"] == 0
+
+
+def test_manually_sent_notice_is_not_sent_again(session_factory, sent):
+    now = datetime.now()
+    notice_id = _add_notice(
+        session_factory,
+        start_time=now + timedelta(seconds=1),
+        end_time=now - timedelta(seconds=1)
+    )
+    scheduler = _new_scheduler(now - timedelta(minutes=1))
+
+    async def run():
+        await scheduler.refresh()
+        scheduler.mark_sent(notice_id)
+        _update_notice(session_factory, notice_id, start_time=now - timedelta(seconds=1))
+        await _tick(scheduler)
+
+    asyncio.run(run())
+
+    # Hanya pesan "layanan pulih" yang dikirim scheduler
+    assert [call["campaign_id"].rsplit("-", 1)[0] for call in sent] == [f"notice-{notice_id}-{KIND_END}"]
@@ -0,0 +1,69 @@
+import asyncio
+
+from app.routers.notifications import _dry_run_response
+from app.services.whatsapp import SKIP_DUPLICATE, SKIP_INVALID, whatsapp_service
+
+RECIPIENTS = [
+    {"phone": "081234567890", "name": "Budi"},
+    {"phone": "6281234567890", "name": "Budi (kantor)"},  # Duplikat setelah normalisasi
+    {"phone": "81234567890", "name": "Budi (lama)"},  # Duplikat setelah normalisasi
+    {"phone": "0", "name": "Tanpa Nomor"},
+    {"phone": "", "name": "Kosong"},
+    {"phone": "0812", "name": "Terlalu Pendek"},
+    {"phone": "+62 813-0000-0001", "name": "Sari"},
+    {"phone": "6285700000002", "name": "Andi"},  # Sudah ternormalisasi
+    {"phone": "085700000002", "name": "Andi (rumah)"}  # Duplikat dari nomor ternormalisasi
+]
+
+
+def test_plan_recipients_counts():
+    plan = whatsapp_service.plan_recipients(RECIPIENTS)
+
+    assert [r["name"] for r in plan["valid"]] == ["Budi", "Sari", "Andi"]
+    assert plan["invalid_count"] == 3
+    assert plan["duplicate_count"] == 3
+    # 081..., 81..., +62 813... dan 085... diubah formatnya
+    assert plan["normalized_count"] == 4
+    assert [(r["phone"], r["error"]) for r in plan["skipped"] if r["error"] == SKIP_DUPLICATE] == [
+        ("6281234567890", SKIP_DUPLICATE),
+        ("6281234567890", SKIP_DUPLICATE),
+        ("6285700000002", SKIP_DUPLICATE)
+    ]
+
+
+def test_dry_run_reports_plan_counts():
+    response = _dry_run_response(RECIPIENTS)
+
+    assert response.total_customers == 9
+    assert response.sent_count == 0
+    assert response.skipped_count == 6
+    assert response.dry_run.total_customers == 9
+    assert response.dry_run.valid_count == 3
+    assert response.dry_run.invalid_count == 3
+    assert response.dry_run.duplicate_count == 3
+    assert response.dry_run.normalized_count == 4
+
+
+def test_send_bulk_skips_the_same_numbers_as_dry_run(monkeypatch):
+    posted = []
+
+    async def fake_request(method, endpoint, data=None):
+        posted.extend(data["recipients"])
+        return {
+            "results": [
+                {"phone": r["phone"], "customer_name": r["name"], "success": True}
+                for r in data["recipients"]
+            ]
+        }
+
+    monkeypatch.setattr(whatsapp_service, "_request", fake_request)
+    monkeypatch.setattr(whatsapp_service, "bulk_chunk_size", 2)
+    monkeypatch.setattr(whatsapp_service, "seconds_per_recipient", None)
+
+    results = asyncio.run(whatsapp_service.send_bulk(RECIPIENTS, "Halo", delay=0))
+    dry_run = _dry_run_response(RECIPIENTS)
+
+    assert [r["name"] for r in posted] == ["Budi", "Sari", "Andi"]
+    skipped = [(r["phone"], r["error"]) for r in results if r.get("error") in (SKIP_INVALID, SKIP_DUPLICATE)]
+    assert skipped == [(r.phone, r.error) for r in dry_run.results]
+    assert sum(1 for r in results if r["success"]) == dry_run.dry_run.valid_count
@@ -1,5 +1,8 @@
-const { Client, LocalAuth } = require('whatsapp-web.js');
+const { Client, LocalAuth, MessageMedia } = require('whatsapp-web.js');
 const express = require('express');
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
 const qrcode = require('qrcode-terminal');
 const QRCode = require('qrcode');
 
@@ -89,6 +92,109 @@ client.on('disconnected', (reason) => {
     }, 5000);
 });
 
+// ==================== RECEIPT (ACK) ====================
+
+// URL FastAPI untuk menerima ack delivered/read
+const RECEIPT_WEBHOOK_URL = process.env.RECEIPT_WEBHOOK_URL || 'http://localhost:8001/api/receipts';
+const RECEIPT_FLUSH_MS = 2000;
+const MAX_TRACKED_MESSAGES = 50000;
+// Batas receipt yang ditahan saat FastAPI tidak bisa dihubungi
+const MAX_PENDING_RECEIPTS = 20000;
+
+// message id -> { campaign_id, phone }
+const messageCampaigns = new Map();
+let pendingReceipts = [];
+
+function trackMessage(sentMessage, campaignId, phone) {
+    if (!campaignId || !sentMessage || !sentMessage.id) return;
+    
+    messageCampaigns.set(sentMessage.id._serialized, { campaign_id: campaignId, phone: phone });
+    
+    // Buang entry paling lama agar memori tidak terus bertambah
+    if (messageCampaigns.size > MAX_TRACKED_MESSAGES) {
+        messageCampaigns.delete(messageCampaigns.keys().next().value);
+    }
+}
+
+// Event: Ack (2 = terkirim ke perangkat, 3 = dibaca, 4 = diputar)
+client.on('message_ack', (msg, ack) => {
+    const tracked = messageCampaigns.get(msg.id._serialized);
+    if (!tracked || ack < 2) return;
+    
+    pendingReceipts.push({
+        campaign_id: tracked.campaign_id,
+        phone: tracked.phone,
+        status: ack >= 3 ? 'read' : 'delivered',
+        timestamp: new Date().toISOString()
+    });
+    
+    if (ack >= 3) {
+        messageCampaigns.delete(msg.id._serialized);
+    }
+});
+
+// Kirim ack ke FastAPI secara batch
+setInterval(async () => {
+    if (pendingReceipts.length === 0) return;
+    
+    const events = pendingReceipts;
+    pendingReceipts = [];
+    
+    try {
+        const response = await fetch(RECEIPT_WEBHOOK_URL, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ events })
+        });
+        
+        if (response.status >= 400 && response.status < 500) {
+            // Ditolak FastAPI (mis. 422): dikirim ulang pun tetap ditolak
+            console.error(`❌ Receipt ditolak (${response.status}), ${events.length} event dibuang`);
+        } else if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+    } catch (error) {
+        console.error('❌ Gagal mengirim receipt:', error.message);
+        pendingReceipts = events.concat(pendingReceipts);
+        
+        // Buang event paling lama jika FastAPI terlalu lama tidak tersedia
+        if (pendingReceipts.length > MAX_PENDING_RECEIPTS) {
+            const dropped = pendingReceipts.length - MAX_PENDING_RECEIPTS;
+            pendingReceipts = pendingReceipts.slice(dropped);
+            console.error(`⚠️ Antrean receipt penuh, ${dropped} event terlama dibuang`);
+        }
+    }
+}, RECEIPT_FLUSH_MS);
+
+// ==================== MEDIA ====================
+
+// File media disimpan sekali per hash (sha256) lalu dipakai ulang untuk semua penerima
+const MEDIA_DIR = path.join(__dirname, 'media');
+fs.mkdirSync(MEDIA_DIR, { recursive: true });
+
+// hash -> MessageMedia (dimuat sekali dari disk)
+const mediaCache = new Map();
+
+function mediaPaths(hash) {
+    return {
+        file: path.join(MEDIA_DIR, hash),
+        meta: path.join(MEDIA_DIR, hash + '.json')
+    };
+}
+
+function loadMedia(hash) {
+    if (!/^[a-f0-9]{64}$/.test(hash)) return null;
+    if (mediaCache.has(hash)) return mediaCache.get(hash);
+    
+    const paths = mediaPaths(hash);
+    if (!fs.existsSync(paths.file) || !fs.existsSync(paths.meta)) return null;
+    
+    const meta = JSON.parse(fs.readFileSync(paths.meta, 'utf8'));
+    const media = new MessageMedia(meta.mimetype, fs.readFileSync(paths.file).toString('base64'), meta.filename);
+    mediaCache.set(hash, media);
+    return media;
+}
+
 // Event: Message (untuk debug)
 client.on('message', async (msg) => {
     console.log(`📩 Pesan masuk dari ${msg.from}: ${msg.body.substring(0, 50)}...`);
@@ -129,9 +235,42 @@ app.get('/qr', (req, res) => {
     });
 });
 
+// Cek apakah media dengan hash tertentu sudah ada
+app.get('/media/:hash', (req, res) => {
+    res.json({ success: true, exists: loadMedia(req.params.hash) !== null });
+});
+
+// Upload media (raw body), diverifikasi dengan sha256
+app.post('/media', express.raw({ type: '*/*', limit: '64mb' }), (req, res) => {
+    const { hash, mimetype, filename } = req.query;
+    
+    if (!hash || !mimetype || !Buffer.isBuffer(req.body)) {
+        return res.status(400).json({
+            success: false,
+            error: 'Parameter hash, mimetype dan body file diperlukan'
+        });
+    }
+    
+    const actualHash = crypto.createHash('sha256').update(req.body).digest('hex');
+    if (actualHash !== hash) {
+        return res.status(400).json({
+            success: false,
+            error: 'Hash file tidak cocok'
+        });
+    }
+    
+    const paths = mediaPaths(hash);
+    fs.writeFileSync(paths.file, req.body);
+    fs.writeFileSync(paths.meta, JSON.stringify({ mimetype, filename: filename || hash }));
+    mediaCache.set(hash, new MessageMedia(mimetype, req.body.toString('base64'), filename || hash));
+    
+    console.log(`📎 Media tersimpan: ${filename || hash} (${req.body.length} bytes)`);
+    res.json({ success: true, hash: hash });
+});
+
 // Kirim pesan
 app.post('/send', async (req, res) => {
-    const { phone, message } = req.body;
+    const { phone, message, media_hash } = req.body;
     
     if (!waStatus.ready) {
         return res.status(503).json({
@@ -147,6 +286,14 @@ app.post('/send', async (req, res) => {
         });
     }
     
+    const media = media_hash ? loadMedia(media_hash) : null;
+    if (media_hash && !media) {
+        return res.status(400).json({
+            success: false,
+            error: 'Media tidak ditemukan, upload ulang melalui /media'
+        });
+    }
+    
     try {
         // Format nomor ke format WhatsApp (628xxx@c.us)
         let formattedPhone = phone.toString().replace(/\D/g, '');
@@ -179,8 +326,12 @@ app.post('/send', async (req, res) => {
             });
         }
         
-        // Kirim pesan
-        await client.sendMessage(chatId, message);
+        // Kirim pesan (dengan media jika ada, pesan menjadi caption)
+        if (media) {
+            await client.sendMessage(chatId, media, { caption: message });
+        } else {
+            await client.sendMessage(chatId, message);
+        }
         
         console.log(`✅ Pesan terkirim ke ${formattedPhone}`);
         
@@ -202,7 +353,7 @@ app.post('/send', async (req, res) => {
 
 // Kirim bulk (multiple recipients)
 app.post('/send-bulk', async (req, res) => {
-    const { recipients, message, delay = 2000 } = req.body;
+    const { recipients, message, delay = 2000, campaign_id, media_hash } = req.body;
     
     if (!waStatus.ready) {
         return res.status(503).json({
@@ -218,6 +369,14 @@ app.post('/send-bulk', async (req, res) => {
         });
     }
     
+    const media = media_hash ? loadMedia(media_hash) : null;
+    if (media_hash && !media) {
+        return res.status(400).json({
+            success: false,
+            error: 'Media tidak ditemukan, upload ulang melalui /media'
+        });
+    }
+    
     const results = [];
     
     for (const recipient of recipients) {
@@ -265,7 +424,10 @@ app.post('/send-bulk', async (req, res) => {
             }
             
             // Kirim
-            await client.sendMessage(chatId, personalizedMessage);
+            const sentMessage = media
+                ? await client.sendMessage(chatId, media, { caption: personalizedMessage })
+                : await client.sendMessage(chatId, personalizedMessage);
+            trackMessage(sentMessage, campaign_id, formattedPhone);
             
             console.log(`✅ Terkirim ke ${name} (${formattedPhone})`);
             
@@ -346,6 +508,7 @@ app.listen(PORT, () => {
     console.log(`   GET  /qr         - Ambil QR Code (base64)`);
     console.log(`   POST /send       - Kirim pesan ke satu nomor`);
     console.log(`   POST /send-bulk  - Kirim pesan ke banyak nomor`);
+    console.log(`   POST /media      - Upload media (sekali per hash)`);
     console.log(`   POST /restart    - Restart WhatsApp client`);
     console.log(`   POST /logout     - Logout dari WhatsApp`);
     console.log('\n⏳ Menginisialisasi WhatsApp Client...\n');